@@ -0,0 +1,360 @@
+#### *ISS Tracker - Ground-Track Analytics*
+
+
+###### Overview
+# - Loads a time range of stored positions into NumPy arrays, from the `iss_tracker`
+#   table (QuestDB `/exp` CSV export, optionally for one NORAD `id`) or from
+#   `tracking_history.csv`-style dumps.
+# - Everything after loading is vectorised: step distances, ground speed, heading,
+#   day/night segments at the sub-satellite point and passes over regions. Months of
+#   1 Hz data (millions of rows) are handled in a few array passes.
+# - Regions are bounding boxes or polygons:
+#       {"name": "Kazakhstan", "bbox": [south, west, north, east]}
+#       {"name": "Tasman Sea", "rings": [[[lon, lat], ...], [[lon, lat], ...]]}
+#   Rings use the `data/ocean_polygons.json` layout (outline first, then holes), so
+#   that file can be used as a region file as-is. A bbox with west > east wraps the
+#   antimeridian.
+# - Steps longer than `max_gap` seconds (outages, sparse history) are not measured:
+#   their distance, speed and heading are NaN, and they split passes and segments.
+
+
+###### Dependencies
+# ```Python
+import json
+import logging
+import numpy as np
+import time
+from datetime import datetime, timezone
+from itertools import chain
+from backfill import open_history, parse_history_line
+from iss_tracker import QDB_HOST, QDB_HTTP_PORT, REQUEST_TIMEOUT, get_session
+from orbit import EARTH_RADIUS, UNIX_J2000, gmst
+# ```
+
+
+###### Configurations
+# ```Python
+MAX_GAP = 120.0             # seconds; longer steps are treated as gaps in the track
+GRID_CELL = 1.0             # degrees; cell size of the region index
+SUNRISE_ELEVATION = -0.833  # degrees; sun elevation at sunrise/sunset (refraction + disc)
+SOLAR_STEP = 3600.0         # seconds; solar position grid, interpolated in between
+# ```
+
+
+###### Load
+# - A track is a dict of equal-length arrays, sorted by time with duplicate
+#   timestamps dropped: `timestamp` (Unix seconds), `latitude`, `longitude`.
+# ```Python
+def make_track(timestamps, latitudes, longitudes) -> dict:
+    """Build a time-sorted, de-duplicated track from position arrays"""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    order = np.argsort(timestamps, kind='stable')
+    _, first = np.unique(timestamps[order], return_index=True)
+    keep = order[first]
+    return {
+        'timestamp': timestamps[keep],
+        'latitude': np.asarray(latitudes, dtype=np.float64)[keep],
+        'longitude': np.asarray(longitudes, dtype=np.float64)[keep],
+    }
+
+
+def _unix(moment) -> float:
+    if moment is None or isinstance(moment, (int, float)):
+        return moment
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def load_csv(path: str, start=None, end=None, delimiter: str = ';', satellite: str = None) -> dict:
+    """Load positions from a history dump, optionally limited to [start, end) and one satellite"""
+    start, end = _unix(start), _unix(end)
+    timestamps, latitudes, longitudes = [], [], []
+    with open_history(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = parse_history_line(line, delimiter)
+            except ValueError:
+                continue
+            if satellite is not None and row['name'] != satellite:
+                continue
+            t = row['timestamp'].timestamp()
+            if (start is None or t >= start) and (end is None or t < end):
+                timestamps.append(t)
+                latitudes.append(row['latitude'])
+                longitudes.append(row['longitude'])
+    logging.info(f"Loaded {len(timestamps)} position(s) from {path}")
+    return make_track(timestamps, latitudes, longitudes)
+
+
+def load_questdb(start=None, end=None, satellite: str = None, table: str = 'iss_tracker') -> dict:
+    """Load positions in [start, end) from QuestDB through its CSV export endpoint"""
+    start, end = _unix(start), _unix(end)
+    where = [] if satellite is None else ["name = '" + satellite.replace("'", "''") + "'"]
+    if start is not None:
+        where.append(f"timestamp >= {int(start * 1e6)}")
+    if end is not None:
+        where.append(f"timestamp < {int(end * 1e6)}")
+    query = (f"SELECT cast(timestamp AS long), latitude, longitude FROM {table}"
+             + (" WHERE " + " AND ".join(where) if where else ""))
+    url = f"http://{QDB_HOST}:{QDB_HTTP_PORT}/exp"
+    response = get_session(url).get(url, params={'query': query}, stream=True, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    lines = response.iter_lines(decode_unicode=True)
+    next(lines, None)   # header
+    first = next(lines, None)
+    if first is None:
+        data = np.empty((0, 3))
+    else:
+        data = np.loadtxt(chain([first], lines), delimiter=',', ndmin=2, dtype=np.float64)
+    logging.info(f"Loaded {len(data)} position(s) from {table}")
+    return make_track(data[:, 0] / 1e6, data[:, 1], data[:, 2])
+# ```
+
+
+###### Track Metrics
+# ```Python
+def steps(track: dict, max_gap: float = MAX_GAP) -> dict:
+    """Per-step (sample i to i+1) duration, distance (km), ground speed (km/h) and heading"""
+    t = track['timestamp']
+    phi = np.radians(track['latitude'])
+    cos_phi, sin_phi = np.cos(phi), np.sin(phi)
+    dt = np.diff(t)
+    gap = dt > max_gap
+    dlam = np.radians(np.diff(track['longitude']))
+    # haversine distance and initial bearing share the per-point sines/cosines
+    h = np.sin(np.diff(phi) / 2)**2 + cos_phi[:-1] * cos_phi[1:] * np.sin(dlam / 2)**2
+    distance = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(h))
+    distance[gap] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed = distance / dt * 3600.0
+    heading = np.degrees(np.arctan2(
+        np.sin(dlam) * cos_phi[1:],
+        cos_phi[:-1] * sin_phi[1:] - sin_phi[:-1] * cos_phi[1:] * np.cos(dlam))) % 360.0
+    heading[gap] = np.nan
+    return {'seconds': dt, 'distance': distance, 'speed': speed, 'heading': heading, 'gap': gap}
+
+
+def solar_position(timestamps) -> tuple:
+    """Sun declination and right ascension in radians (low-precision, ~0.01°)"""
+    n = (np.asarray(timestamps, dtype=np.float64) - UNIX_J2000) / 86400.0
+    mean_lon = np.radians(280.460 + 0.9856474 * n)
+    anomaly = np.radians(357.528 + 0.9856003 * n)
+    ecliptic_lon = mean_lon + np.radians(1.915) * np.sin(anomaly) + np.radians(0.020) * np.sin(2 * anomaly)
+    obliquity = np.radians(23.439 - 4e-7 * n)
+    declination = np.arcsin(np.sin(obliquity) * np.sin(ecliptic_lon))
+    right_ascension = np.arctan2(np.cos(obliquity) * np.sin(ecliptic_lon), np.cos(ecliptic_lon))
+    return declination, right_ascension
+
+
+def sun_elevation(timestamps, lat, lon) -> np.ndarray:
+    """Sun elevation in degrees at lat/lon"""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if timestamps.size == 0:
+        return np.empty(0)
+    # the sun moves ~0.04°/hour against the stars, so its position is computed on a
+    # coarse grid and interpolated; only the Earth's rotation is evaluated per sample
+    grid = np.arange(timestamps.min(), timestamps.max() + SOLAR_STEP, SOLAR_STEP)
+    declination, right_ascension = solar_position(grid)
+    declination = np.interp(timestamps, grid, declination)
+    right_ascension = np.interp(timestamps, grid, np.unwrap(right_ascension))
+    hour_angle = gmst(timestamps) + np.radians(lon) - right_ascension
+    phi = np.radians(lat)
+    return np.degrees(np.arcsin(
+        np.sin(phi) * np.sin(declination) + np.cos(phi) * np.cos(declination) * np.cos(hour_angle)))
+
+
+def daylight(track: dict) -> np.ndarray:
+    """True where the sun is up at the sub-satellite point"""
+    return sun_elevation(track['timestamp'], track['latitude'], track['longitude']) > SUNRISE_ELEVATION
+
+
+def _runs(mask: np.ndarray, timestamps: np.ndarray, max_gap: float) -> tuple:
+    """Return first/last indices of runs of True in `mask`, split at time gaps"""
+    if mask.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    linked = np.diff(timestamps) <= max_gap
+    joined = mask[:-1] & mask[1:] & linked
+    starts = mask & ~np.concatenate(([False], joined))
+    ends = mask & ~np.concatenate((joined, [False]))
+    return np.flatnonzero(starts), np.flatnonzero(ends)
+
+
+def day_night_segments(track: dict, max_gap: float = MAX_GAP, day: np.ndarray = None) -> list:
+    """Split the track into day and night segments at the sub-satellite point"""
+    t = track['timestamp']
+    day = daylight(track) if day is None else day
+    segments = []
+    for is_day, mask in ((True, day), (False, ~day)):
+        for first, last in zip(*_runs(mask, t, max_gap)):
+            segments.append({'daylight': is_day, 'start': t[first], 'end': t[last],
+                             'samples': int(last - first + 1)})
+    segments.sort(key=lambda segment: segment['start'])
+    return segments
+# ```
+
+
+###### Region Index
+# - The globe is split into `GRID_CELL` degree cells and, per region, each cell is
+#   precomputed as outside, inside or boundary (crossed by an edge). Points in
+#   inside/outside cells are classified by one array lookup; only points in boundary
+#   cells get an exact ray-casting test.
+# - Regions that share a name (e.g. an ocean split into several areas) are merged.
+# ```Python
+_OUTSIDE, _INSIDE, _BOUNDARY = 0, 1, 2
+
+
+def _in_ring(lon: np.ndarray, lat: np.ndarray, ring: np.ndarray) -> np.ndarray:
+    """Vectorised ray-casting point-in-polygon test"""
+    inside = np.zeros(lon.shape, dtype=bool)
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if y1 != y2:
+            crosses = (y1 > lat) != (y2 > lat)
+            inside ^= crosses & (lon < (x2 - x1) * (lat - y1) / (y2 - y1) + x1)
+        x1, y1 = x2, y2
+    return inside
+
+
+def _in_polygon(lon: np.ndarray, lat: np.ndarray, polygon: list) -> np.ndarray:
+    outline, *holes = polygon
+    inside = _in_ring(lon, lat, outline)
+    for hole in holes:
+        inside &= ~_in_ring(lon, lat, hole)
+    return inside
+
+
+def _polygons(region: dict) -> list:
+    """Normalise a bbox/rings region into a list of [outline, *holes] polygons"""
+    if 'bbox' in region:
+        south, west, north, east = region['bbox']
+        spans = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+        return [[np.array([[w, south], [e, south], [e, north], [w, north]], dtype=np.float64)]
+                for w, e in spans]
+    return [[np.asarray(ring, dtype=np.float64) for ring in region['rings']]]
+
+
+def load_regions(path: str) -> list:
+    """Read regions from a JSON file with a `regions` (or `areas`) list"""
+    with open(path) as f:
+        data = json.load(f)
+    return data['regions'] if 'regions' in data else data['areas']
+
+
+class RegionIndex:
+    """Precomputed grid index for classifying many points against named regions"""
+
+    def __init__(self, regions: list, cell: float = GRID_CELL):
+        self.cell = cell
+        self.n_lat, self.n_lon = int(np.ceil(180.0 / cell)), int(np.ceil(360.0 / cell))
+        polygons = {}
+        for region in regions:
+            polygons.setdefault(region['name'], []).extend(_polygons(region))
+        self.names = list(polygons)
+        self.polygons = list(polygons.values())
+        self.grids = [self._grid(polygons) for polygons in self.polygons]
+
+    def _cells(self, lat, lon) -> tuple:
+        i = np.clip(((np.asarray(lat) + 90.0) // self.cell).astype(np.int64), 0, self.n_lat - 1)
+        j = np.clip(((np.asarray(lon) + 180.0) // self.cell).astype(np.int64), 0, self.n_lon - 1)
+        return i, j
+
+    def _grid(self, polygons: list) -> np.ndarray:
+        grid = np.zeros((self.n_lat, self.n_lon), dtype=np.uint8)
+        for polygon in polygons:
+            outline = polygon[0]
+            (i0, j0), (i1, j1) = [self._cells(lat, lon) for lon, lat in (outline.min(0), outline.max(0))]
+            ii, jj = np.mgrid[i0:i1 + 1, j0:j1 + 1]
+            centre_lat = (ii + 0.5) * self.cell - 90.0
+            centre_lon = (jj + 0.5) * self.cell - 180.0
+            inside = _in_polygon(centre_lon.ravel(), centre_lat.ravel(), polygon).reshape(ii.shape)
+            block = grid[i0:i1 + 1, j0:j1 + 1]
+            block[inside & (block == _OUTSIDE)] = _INSIDE
+            for ring in polygon:
+                # every cell in an edge's bounding box may be crossed by it
+                for (x1, y1), (x2, y2) in zip(ring, np.roll(ring, -1, axis=0)):
+                    (a, b), (c, d) = self._cells(min(y1, y2), min(x1, x2)), self._cells(max(y1, y2), max(x1, x2))
+                    grid[a:c + 1, b:d + 1] = _BOUNDARY
+        return grid
+
+    def contains(self, region: int, lat: np.ndarray, lon: np.ndarray, cells: tuple = None) -> np.ndarray:
+        """True where lat/lon lies inside region number `region`"""
+        lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+        i, j = cells if cells is not None else self._cells(lat, lon)
+        state = self.grids[region][i, j]
+        inside = state == _INSIDE
+        boundary = np.flatnonzero(state == _BOUNDARY)
+        if boundary.size:
+            exact = np.zeros(boundary.size, dtype=bool)
+            for polygon in self.polygons[region]:
+                exact |= _in_polygon(lon[boundary], lat[boundary], polygon)
+            inside[boundary] = exact
+        return inside
+
+    def passes(self, track: dict, max_gap: float = MAX_GAP) -> list:
+        """Return every pass over every region, ordered by entry time"""
+        t, lat, lon = track['timestamp'], track['latitude'], track['longitude']
+        cells = self._cells(lat, lon)
+        found = []
+        for region, name in enumerate(self.names):
+            firsts, lasts = _runs(self.contains(region, lat, lon, cells), t, max_gap)
+            for first, last in zip(firsts, lasts):
+                found.append({'region': name, 'start': t[first], 'end': t[last],
+                              'samples': int(last - first + 1)})
+        found.sort(key=lambda p: p['start'])
+        return found
+# ```
+
+
+###### Summary (main-entry-point)
+# ```Python
+def summarize(track: dict, index: RegionIndex = None, max_gap: float = MAX_GAP) -> dict:
+    """Distance, speed, day/night and region-pass summary of a track"""
+    start = time.perf_counter()
+    summary = {'samples': len(track['timestamp'])}
+    if summary['samples'] < 2:
+        return summary
+    step = steps(track, max_gap)
+    measured = ~step['gap']
+    day = daylight(track)
+    summary.update({
+        'start': track['timestamp'][0],
+        'end': track['timestamp'][-1],
+        'gaps': int(step['gap'].sum()),
+        'distance_km': float(np.nansum(step['distance'])),
+        'mean_speed_kmh': float(np.nansum(step['distance']) / step['seconds'][measured].sum() * 3600.0)
+                          if measured.any() else float('nan'),
+        'max_speed_kmh': float(np.nanmax(step['speed'])) if measured.any() else float('nan'),
+        'daylight_fraction': float(day.mean()),
+        'day_night_segments': len(day_night_segments(track, max_gap, day)),
+    })
+    if index is not None:
+        regions = {}
+        for p in index.passes(track, max_gap):
+            region = regions.setdefault(p['region'], {'passes': 0, 'samples': 0, 'last': None})
+            region['passes'] += 1
+            region['samples'] += p['samples']
+            region['last'] = p['end']
+        summary['regions'] = regions
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def print_summary(summary: dict) -> None:
+    def utc(t):
+        return datetime.fromtimestamp(t, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    if summary['samples'] < 2:
+        print(f"{summary['samples']} position(s); nothing to analyse")
+        return
+    print(f"{summary['samples']} positions from {utc(summary['start'])} to {utc(summary['end'])} UTC "
+          f"({summary['gaps']} gap(s) over the max step)")
+    print(f"Ground distance {summary['distance_km']:.0f} km; ground speed mean "
+          f"{summary['mean_speed_kmh']:.0f} km/h, max {summary['max_speed_kmh']:.0f} km/h")
+    print(f"Over daylight {summary['daylight_fraction']:.0%} of samples; "
+          f"{summary['day_night_segments']} day/night segment(s)")
+    for name, region in sorted(summary.get('regions', {}).items(), key=lambda r: -r[1]['last']):
+        print(f"  {name}: {region['passes']} pass(es), last {utc(region['last'])} UTC")
+# ```
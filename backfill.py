@@ -0,0 +1,122 @@
+#### *ISS Tracker - History Import*
+
+
+###### Overview
+# - Streams `tracking_history.csv`-style dumps into the `iss_tracker` table:
+#       2024-01-07 23:37:41+00:00 (UTC);ISS;46.7408,55.3093;Zhylyoi District, Kazakhstan
+# - Files are read a line at a time (plain or `.gz`), so memory use does not grow
+#   with file size; rows are sent in large batches over one sender connection.
+# - Re-runs are idempotent: repeated timestamps within a file are dropped client-side
+#   (over a bounded window, as dumps are time-ordered) and the table is switched to
+#   `DEDUP UPSERT KEYS(timestamp, name)`, so rows already in QuestDB are replaced,
+#   not duplicated.
+
+
+###### Dependencies
+# ```Python
+import gzip
+import logging
+import questdb.ingress as qdb
+import time
+from collections import deque
+from datetime import datetime
+from iss_tracker import QDB_HOST, QDB_PORT, SATELLITE_NAMES, add_row, enable_dedup
+# ```
+
+
+###### Configurations
+# ```Python
+BATCH_SIZE = 50_000         # rows per flush
+DEDUP_WINDOW = 100_000      # recent timestamps remembered for in-file de-duplication
+MAX_REPORTED_ERRORS = 10    # malformed lines logged individually before going quiet
+SATELLITE_IDS = {name: satellite_id for satellite_id, name in SATELLITE_NAMES.items()}
+# ```
+
+
+###### Parse
+# ```Python
+def parse_history_line(line: str, delimiter: str = ';') -> dict:
+    """Parse one `timestamp;name;lat,lon;address` line into an iss_tracker row"""
+    timestamp, name, position, address = line.rstrip('\r\n').split(delimiter, 3)
+    latitude, longitude = position.split(',')
+    name = name.lower()
+    return {
+        'timestamp': datetime.fromisoformat(timestamp.removesuffix(' (UTC)')),
+        'name': name,
+        'id': SATELLITE_IDS.get(name),
+        'latitude': float(latitude),
+        'longitude': float(longitude),
+        'geolocated_address': address,
+        'source': 'import',
+    }
+
+
+def open_history(path: str):
+    """Open a history dump for streaming text reads; `.gz` files are decompressed on the fly"""
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+# ```
+
+
+###### Import (main-entry-point)
+# ```Python
+def import_history(path: str, batch_size: int = BATCH_SIZE, delimiter: str = ';') -> dict:
+    """Stream a history dump into QuestDB; returns row counts and throughput"""
+    # On a fresh database the table only exists after the first flush; retry once then.
+    dedup = enable_dedup()
+    dedup_retried = dedup
+    stats = {'read': 0, 'imported': 0, 'duplicates': 0, 'malformed': 0}
+    recent, seen = deque(), set()
+    pending = 0
+    start = time.perf_counter()
+    logging.info(f"Import {path}")
+    try:
+        with qdb.Sender(QDB_HOST, QDB_PORT, auto_flush=False) as sender, open_history(path) as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                stats['read'] += 1
+                try:
+                    row = parse_history_line(line, delimiter)
+                except ValueError:
+                    stats['malformed'] += 1
+                    if stats['malformed'] <= MAX_REPORTED_ERRORS:
+                        logging.warning(f"Skipping malformed line {line_no}: {line.rstrip()!r}")
+                    continue
+                key = (row['timestamp'], row['name'])
+                if key in seen:
+                    stats['duplicates'] += 1
+                    continue
+                seen.add(key)
+                recent.append(key)
+                if len(recent) > DEDUP_WINDOW:
+                    seen.discard(recent.popleft())
+                add_row(sender, row)
+                pending += 1
+                if pending >= batch_size:
+                    sender.flush()
+                    stats['imported'] += pending
+                    pending = 0
+                    elapsed = time.perf_counter() - start
+                    logging.info(f"Imported {stats['imported']} rows ({stats['imported'] / elapsed:.0f} rows/s)")
+                    if not dedup_retried:
+                        dedup, dedup_retried = enable_dedup(), True
+            sender.flush()
+            stats['imported'] += pending
+    except qdb.IngressError as e:
+        logging.error(f"Import of {path} stopped after {stats['imported']} rows: {e}")
+        return stats
+    if not dedup_retried:
+        dedup = enable_dedup()
+    if not dedup:
+        logging.warning("Table-level deduplication is off; re-runs may duplicate rows already in QuestDB")
+    elapsed = time.perf_counter() - start
+    stats['seconds'] = elapsed
+    stats['rows_per_second'] = stats['imported'] / elapsed if elapsed else 0.0
+    logging.info(
+        f"Imported {stats['imported']} of {stats['read']} rows from {path} in {elapsed:.1f} seconds "
+        f"({stats['rows_per_second']:.0f} rows/s); {stats['duplicates']} duplicate(s), "
+        f"{stats['malformed']} malformed")
+    return stats
+# ```
@@ -0,0 +1,304 @@
+#### *ISS Tracker - Benchmark*
+
+
+###### Overview
+# - Runs the full ETL offline against local stand-ins for wheretheiss.at, Geoapify
+#   and a QuestDB ILP/TCP listener, each with configurable injected latency.
+# - Reports throughput and per-stage p50/p99 from `metrics`, so regressions can be
+#   measured without touching the real services:
+#       python benchmark.py --samples 200 --extract-latency 0.4 --geocode-latency 0.9
+#       python benchmark.py --mode async --samples 200 --geocode-latency 0.9
+# - `--mode stream` is a load test of the live position stream: `--viewers` SSE
+#   clients connect to a local `StreamServer` and every ETL run is fanned out to
+#   all of them; the `stream_delivery` stage is sample time to receipt by a viewer.
+#   Viewers run in the same process as the server, so results are a lower bound:
+#       python benchmark.py --mode stream --viewers 2000 --rate 10 --samples 200
+# - The geocode cache and write spool use temporary stores, so the benchmark does not
+#   touch `data/` or `spool/`.
+
+
+###### Dependencies
+# ```Python
+import argparse
+import asyncio
+import json
+import logging
+import random
+import resource
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import iss_tracker
+import metrics
+import pipeline
+from geocache import GeocodeCache
+from spool import Spool
+from stream import StreamServer, start_stream_server
+from utils import config
+# ```
+
+
+###### Stand-in Services
+# ```Python
+STREAM_CONNECT_WAIT = 30.0  # seconds for all stream viewers to connect
+STREAM_DRAIN = 1.0          # seconds for the last event to reach every viewer
+
+STAND_IN_TLE = (
+    "1 25544U 98067A   24010.51782528  .00016717  00000-0  30306-3 0  9993",
+    "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.50125391434321",
+)
+
+
+def _position(satellite_id: int, timestamp: float, seed: int) -> dict:
+    rng = random.Random(satellite_id * 1_000_003 + seed)
+    return {
+        'name': 'iss', 'id': satellite_id,
+        'latitude': rng.uniform(-51.6, 51.6), 'longitude': rng.uniform(-180.0, 180.0),
+        'altitude': 420.0, 'velocity': 27600.0, 'visibility': 'daylight', 'footprint': 4500.0,
+        'timestamp': timestamp, 'daynum': timestamp / 86400.0 + 2440587.5,
+        'solar_lat': 0.0, 'solar_lon': 0.0, 'units': 'kilometers',
+    }
+
+
+class StandInAPI(ThreadingHTTPServer):
+    """wheretheiss.at + Geoapify stand-in with injected latency (seconds, +/- jitter)"""
+    daemon_threads = True
+
+    def __init__(self, extract_latency: float = 0.0, geocode_latency: float = 0.0, jitter: float = 0.0):
+        super().__init__(('127.0.0.1', 0), _StandInHandler)
+        self.extract_latency = extract_latency
+        self.geocode_latency = geocode_latency
+        self.jitter = jitter
+        self.requests = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def delay(self, latency: float) -> None:
+        if latency or self.jitter:
+            time.sleep(max(0.0, latency + random.uniform(-self.jitter, self.jitter)))
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True      # headers and body go out in separate writes
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+        if parts[:2] == ['v1', 'satellites'] and len(parts) >= 3:
+            server.delay(server.extract_latency)
+            satellite_id = int(parts[2])
+            if parts[3:] == ['positions']:
+                body = [_position(satellite_id, int(t), int(t)) for t in query['timestamps'][0].split(',')]
+            elif parts[3:] == ['tles']:
+                body = {'id': satellite_id, 'line1': STAND_IN_TLE[0], 'line2': STAND_IN_TLE[1]}
+            else:
+                body = _position(satellite_id, time.time(), server.requests)
+        elif parts == ['geocode']:
+            server.delay(server.geocode_latency)
+            body = {'features': [{'properties': {
+                'formatted': f"Stand-in place {float(query['lat'][0]):.1f},{float(query['lon'][0]):.1f}"}}]}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInQuestDB:
+    """ILP/TCP listener that counts received rows; `latency` is added per read"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.rows = 0
+        self.lock = threading.Lock()
+        self.sock = socket.create_server(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            conn, _ = self.sock.accept()
+            threading.Thread(target=self._read_loop, args=(conn,), daemon=True).start()
+
+    def _read_loop(self, conn):
+        with conn:
+            while data := conn.recv(1 << 16):
+                if self.latency:
+                    time.sleep(self.latency)
+                with self.lock:
+                    self.rows += data.count(b'\n')
+# ```
+
+
+###### Benchmark Runs
+# ```Python
+def run_sync(samples: int, loader: iss_tracker.ISSDataLoader) -> None:
+    """Back-to-back `extract_transform_load` calls, as the daemon makes them"""
+    for _ in range(samples):
+        with metrics.timer('etl'):
+            iss_tracker.extract_transform_load(loader)
+    loader.close()
+
+
+async def run_async(samples: int, loader: iss_tracker.ISSDataLoader) -> None:
+    """Back-to-back position captures through the asyncio pipeline stages (no dedup)"""
+    load_queue = asyncio.Queue(pipeline.QUEUE_SIZE)
+    geocode_queue = asyncio.Queue(pipeline.QUEUE_SIZE)
+    dedup = asyncio.Event()
+    load_task = asyncio.create_task(pipeline.load_worker(load_queue, loader, dedup))
+    geocode_tasks = [asyncio.create_task(pipeline.geocode_worker(geocode_queue, load_queue))
+                     for _ in range(pipeline.GEOCODE_CONCURRENCY)]
+    fetch_limit = asyncio.Semaphore(pipeline.FETCH_CONCURRENCY)
+    for _ in range(samples):
+        with metrics.timer('etl'):
+            await pipeline.capture_position(fetch_limit, load_queue, geocode_queue, dedup)
+    for _ in geocode_tasks:
+        await geocode_queue.put(None)
+    await asyncio.gather(*geocode_tasks)
+    await load_queue.put(None)
+    await load_task
+
+
+async def run_stream(samples: int, viewers: int, rate: float, loader: iss_tracker.ISSDataLoader,
+                     server: StreamServer) -> dict:
+    """Fan `samples` ETL runs, `rate` per second, out to `viewers` SSE clients"""
+    delivery = metrics.stage_histogram('stream_delivery')
+    received = [0] * viewers
+
+    async def viewer(n: int) -> None:
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        writer.write(b"GET /positions/stream HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        try:
+            while line := await reader.readline():
+                if line.startswith(b'data: '):
+                    delivery.observe(time.time() - json.loads(line[6:])['timestamp'])
+                    received[n] += 1
+        finally:
+            writer.close()
+
+    tasks = [asyncio.create_task(viewer(n)) for n in range(viewers)]
+    deadline = time.monotonic() + STREAM_CONNECT_WAIT
+    while server.viewers < viewers and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    connected = server.viewers
+    for _ in range(samples):
+        start = time.perf_counter()
+        with metrics.timer('etl'):
+            await asyncio.to_thread(iss_tracker.extract_transform_load, loader)
+        await asyncio.sleep(max(0.0, 1 / rate - (time.perf_counter() - start)))
+    await asyncio.sleep(STREAM_DRAIN)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    loader.close()
+    return {'viewers': connected, 'events_published': samples, 'events_delivered': sum(received),
+            'min_delivered': min(received, default=0)}
+
+
+def report(elapsed: float, samples: int, api: StandInAPI, questdb: StandInQuestDB) -> dict:
+    """Collect throughput, stage latencies and counters into one dict"""
+    snapshot = metrics.snapshot()
+    return {
+        'samples': samples,
+        'seconds': elapsed,
+        'samples_per_second': samples / elapsed if elapsed else 0.0,
+        'api_requests': api.requests,
+        'rows_received': questdb.rows,
+        'geocode_cache': iss_tracker.get_geocode_cache().stats(),
+        'stages': {name.split('=', 1)[1].rstrip('}'): {k: h[k] for k in ('count', 'p50', 'p99', 'mean')}
+                   for name, h in snapshot['histograms'].items() if name.startswith('stage_seconds')},
+        'counters': snapshot['counters'],
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"{result['samples']} samples in {result['seconds']:.2f} s "
+          f"({result['samples_per_second']:.1f} samples/s); "
+          f"{result['api_requests']} API requests; {result['rows_received']} rows received by QuestDB")
+    print(f"{'stage':<16}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for stage, h in sorted(result['stages'].items()):
+        print(f"{stage:<16}{h['count']:>8}{h['p50'] * 1000:>10.2f}{h['p99'] * 1000:>10.2f}{h['mean'] * 1000:>10.2f}")
+    for name, value in sorted(result['counters'].items()):
+        print(f"{name}: {value}")
+    cache = result['geocode_cache']
+    print(f"geocode cache: {cache['hits']} hits, {cache['ocean_hits']} offline, {cache['misses']} misses")
+    if 'stream' in result:
+        stream = result['stream']
+        print(f"stream: {stream['viewers']} viewers; {stream['events_delivered']} of "
+              f"{stream['events_published'] * stream['viewers']} events delivered "
+              f"(slowest viewer got {stream['min_delivered']} of {stream['events_published']})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the ETL against local stand-in services")
+    parser.add_argument('--mode', choices=('sync', 'async', 'stream'), default='sync')
+    parser.add_argument('--samples', type=int, default=100)
+    parser.add_argument('--extract-latency', type=float, default=0.0, help="seconds per position request")
+    parser.add_argument('--geocode-latency', type=float, default=0.0, help="seconds per geocode request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="+/- seconds added to API latency")
+    parser.add_argument('--questdb-latency', type=float, default=0.0, help="seconds per ILP read")
+    parser.add_argument('--flush-rows', type=int, default=iss_tracker.FLUSH_ROWS)
+    parser.add_argument('--viewers', type=int, default=1000, help="SSE clients in stream mode")
+    parser.add_argument('--rate', type=float, default=10.0, help="ETL runs per second in stream mode")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    logging.getLogger().handlers = [logging.StreamHandler()]
+    logging.getLogger().setLevel(logging.WARNING)
+    api = StandInAPI(args.extract_latency, args.geocode_latency, args.jitter)
+    questdb = StandInQuestDB(args.questdb_latency)
+    config["Where-is-ISS"]["url"] = f"{api.url}/v1/satellites/25544"
+    config["Geoapify"]["url"] = f"{api.url}/geocode"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        iss_tracker._geocode_cache = GeocodeCache(Path(tmp) / 'geocode_cache.db')
+        iss_tracker._spool = Spool(Path(tmp) / 'spool')
+        metrics.reset()
+        loader = iss_tracker.ISSDataLoader(port=questdb.port, flush_rows=args.flush_rows)
+        start = time.perf_counter()
+        if args.mode == 'sync':
+            run_sync(args.samples, loader)
+        elif args.mode == 'async':
+            asyncio.run(run_async(args.samples, loader))
+        else:
+            # each viewer holds two descriptors here, its own and the server's
+            soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            server = start_stream_server(0)
+            iss_tracker.add_row_listener(server.publish)
+            stream = asyncio.run(run_stream(args.samples, args.viewers, args.rate, loader, server))
+            server.stop()
+        elapsed = time.perf_counter() - start
+        time.sleep(0.1)     # let the listener read the last flush
+        result = report(elapsed, args.samples, api, questdb)
+        if args.mode == 'stream':
+            result['stream'] = stream
+        iss_tracker.close_geocode_cache()
+        iss_tracker.close_spool()
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
+# ```
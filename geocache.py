@@ -0,0 +1,262 @@
+#### *ISS Tracker - Reverse Geocoding Cache*
+
+
+###### Overview
+# - Sits in front of the Geoapify reverse-geocode call made for every ISS sample.
+# - Over open water the address is answered offline from a bundled ocean/sea polygon
+#   index (`data/ocean_polygons.json`), so those points never hit the network.
+# - Everything else is keyed on a geohash cell and kept in a bounded LRU cache that
+#   is persisted to SQLite, so it survives restarts and can be warmed from history.
+# - The ground track rarely passes over the same few kilometres twice, so cells are
+#   coarse: `GEOHASH_PRECISION` for land addresses, and the much larger
+#   `WATER_PRECISION` for water-body answers ("Arabian Sea") outside the polygons.
+
+
+###### Dependencies
+# ```Python
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import metrics
+# ```
+
+
+###### Configurations
+# ```Python
+DATA_DIR = Path(__file__).with_name('data')
+OCEAN_POLYGONS = DATA_DIR / 'ocean_polygons.json'
+CACHE_DB = DATA_DIR / 'geocode_cache.db'
+HISTORY_CSV = Path(__file__).with_name('tracking_history.csv')
+GEOHASH_PRECISION = 4       # ~39 km x 20 km land cells; one per town/district
+WATER_PRECISION = 3         # ~156 km x 156 km cells for bare sea/ocean names
+WATER_BODIES = ('Ocean', 'Sea', 'Gulf', 'Bay', 'Bight', 'Channel', 'Strait', 'Passage', 'Sound')
+CACHE_SIZE = 100_000        # cells kept in memory and on disk
+INDEX_CELL = 10             # degrees; bucket size of the ocean polygon index
+# ```
+
+
+###### Geohash
+# ```Python
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Return the geohash of the cell containing lat/lon"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+# ```
+
+
+###### Offline Ocean Index
+# - Each area is an outline ring plus optional island rings cut out of it.
+# - Areas are bucketed by `INDEX_CELL` degree cells of their bounding box, so a
+#   lookup only runs point-in-polygon tests against the few areas near the point.
+# ```Python
+def _point_in_ring(lon: float, lat: float, ring: list) -> bool:
+    """Ray-casting point-in-polygon test"""
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > lat) != (y2 > lat) and lon < (x2 - x1) * (lat - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+class OceanIndex:
+    """Spatial index of named open-water areas"""
+
+    def __init__(self, path: Path = OCEAN_POLYGONS):
+        with open(path) as f:
+            self.areas = json.load(f)['areas']
+        self.buckets = {}
+        for area in self.areas:
+            outline = area['rings'][0]
+            lons = [lon for lon, _ in outline]
+            lats = [lat for _, lat in outline]
+            for i in range(self._bucket(min(lons)), self._bucket(max(lons)) + 1):
+                for j in range(self._bucket(min(lats)), self._bucket(max(lats)) + 1):
+                    self.buckets.setdefault((i, j), []).append(area)
+
+    @staticmethod
+    def _bucket(degrees: float) -> int:
+        return int(degrees // INDEX_CELL)
+
+    def lookup(self, lat: float, lon: float) -> str:
+        """Return the name of the open-water area containing lat/lon, or '' if none"""
+        for area in self.buckets.get((self._bucket(lon), self._bucket(lat)), ()):
+            outline, *islands = area['rings']
+            if _point_in_ring(lon, lat, outline) and not any(_point_in_ring(lon, lat, r) for r in islands):
+                return area['name']
+        return ""
+# ```
+
+
+###### Geocode Cache
+# - `lookup(lat, lon)` answers from the ocean index, then the land cell, then the
+#   water cell, without touching the network; `address(lat, lon, fetch)` also calls
+#   `fetch()` on a miss. Empty addresses (failed lookups) are not cached.
+# - Water cells are keyed `~<geohash>`; cells stored at another precision are
+#   dropped when the cache is opened.
+# - New entries are written through to SQLite; recency is saved on `close()`.
+# - Lookups are also exported to `metrics` as `geocode_cache_total{result=hit|ocean|miss}`
+#   and `geocode_seconds_saved_total` (each served lookup saves the average miss time).
+# ```Python
+def is_water_body(address: str) -> bool:
+    """True for a bare sea/ocean name such as 'Tasman Sea' (no country, so no comma)"""
+    return bool(address) and ',' not in address and any(word in WATER_BODIES for word in address.split())
+
+
+class GeocodeCache:
+    """Bounded LRU cache of reverse-geocoded addresses keyed on geohash cells"""
+
+    def __init__(self, path: Path = CACHE_DB, max_size: int = CACHE_SIZE,
+                 precision: int = GEOHASH_PRECISION, water_precision: int = WATER_PRECISION,
+                 ocean_index: OceanIndex = None):
+        self.max_size = max_size
+        self.precision = precision
+        self.water_precision = water_precision
+        self.ocean_index = ocean_index if ocean_index is not None else OceanIndex()
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.ocean_hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS geocode '
+            '(cell TEXT PRIMARY KEY, address TEXT NOT NULL, last_used REAL NOT NULL)')
+        self.db.execute("DELETE FROM geocode WHERE NOT (length(cell) = ? AND cell NOT LIKE '~%' "
+                        "OR length(cell) = ? AND cell LIKE '~%')", (precision, water_precision + 1))
+        self.db.commit()
+        rows = self.db.execute(
+            'SELECT cell, address FROM geocode ORDER BY last_used DESC LIMIT ?', (max_size,)).fetchall()
+        for cell, address in reversed(rows):
+            self.entries[cell] = address
+        logging.info(f"Loaded {len(self.entries)} cached geocode cell(s)")
+
+    def lookup(self, lat: float, lon: float) -> str:
+        """Return the offline or cached address at lat/lon, or '' if it is not known"""
+        lat, lon = float(lat), float(lon)
+        ocean = self.ocean_index.lookup(lat, lon)
+        if ocean:
+            with self.lock:
+                self.ocean_hits += 1
+                self._count('ocean')
+            return ocean
+        cells = (geohash(lat, lon, self.precision), self._water_cell(lat, lon))
+        with self.lock:
+            for cell in cells:
+                if cell in self.entries:
+                    self.entries.move_to_end(cell)
+                    self.hits += 1
+                    self._count('hit')
+                    return self.entries[cell]
+        return ""
+
+    def _water_cell(self, lat: float, lon: float) -> str:
+        return '~' + geohash(lat, lon, self.water_precision)
+
+    def _cell(self, lat: float, lon: float, address: str) -> str:
+        """Return the cell an address is stored under: a water cell for a bare sea name"""
+        if is_water_body(address):
+            return self._water_cell(lat, lon)
+        return geohash(lat, lon, self.precision)
+
+    def address(self, lat: float, lon: float, fetch) -> str:
+        """Return the address at lat/lon, calling `fetch()` only on a cache miss"""
+        address = self.lookup(lat, lon)
+        if address:
+            return address
+        start = time.perf_counter()
+        address = fetch()
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.misses += 1
+            self.miss_seconds += elapsed
+            self._count('miss')
+            if address:
+                self._put(self._cell(float(lat), float(lon), address), address)
+        return address
+
+    def _count(self, result: str) -> None:
+        metrics.counter('geocode_cache_total', result=result).inc()
+        if result != 'miss' and self.misses:
+            metrics.counter('geocode_seconds_saved_total').inc(self.miss_seconds / self.misses)
+
+    def _put(self, cell: str, address: str, commit: bool = True) -> None:
+        self.entries[cell] = address
+        self.entries.move_to_end(cell)
+        self.db.execute('INSERT OR REPLACE INTO geocode VALUES (?, ?, ?)', (cell, address, time.time()))
+        if len(self.entries) > self.max_size:
+            evicted, _ = self.entries.popitem(last=False)
+            self.db.execute('DELETE FROM geocode WHERE cell = ?', (evicted,))
+        if commit:
+            self.db.commit()
+
+    def warm_from_history(self, path: Path = HISTORY_CSV) -> int:
+        """Seed the cache from a `timestamp;name;lat,lon;address` history file; returns rows used"""
+        count = 0
+        with open(path, encoding='utf-8') as f, self.lock:
+            for line in f:
+                try:
+                    _, _, position, address = line.rstrip('\n').split(';', 3)
+                    lat, lon = (float(x) for x in position.split(','))
+                except ValueError:
+                    continue
+                if address and not self.ocean_index.lookup(lat, lon):
+                    cell = self._cell(lat, lon, address)
+                    if cell not in self.entries:
+                        self._put(cell, address, commit=False)
+                        count += 1
+            self.db.commit()
+        logging.info(f"Warmed geocode cache with {count} cell(s) from {path}")
+        return count
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the network time saved by the cache"""
+        with self.lock:
+            served = self.hits + self.ocean_hits
+            lookups = served + self.misses
+            avg_miss = self.miss_seconds / self.misses if self.misses else 0.0
+            return {
+                'hits': self.hits,
+                'ocean_hits': self.ocean_hits,
+                'misses': self.misses,
+                'hit_rate': served / lookups if lookups else 0.0,
+                'cells': len(self.entries),
+                'avg_miss_seconds': avg_miss,
+                'seconds_saved': served * avg_miss,
+            }
+
+    def close(self) -> None:
+        """Persist recency of the in-memory entries and close the store"""
+        with self.lock:
+            now = time.time()
+            self.db.executemany(
+                'UPDATE geocode SET last_used = ? WHERE cell = ?',
+                ((now + i * 1e-6, cell) for i, cell in enumerate(self.entries)))
+            self.db.commit()
+            self.db.close()
+# ```
@@ -3,7 +3,6 @@
 
 ###### To do
 # ```
-# - Handle errors from db write
 # - Write logs to db
 # - Compile to executable
 # - Replace .sh with executable in launchd
@@ -13,13 +12,20 @@
 
 ###### Dependencies
 # ```Python
+import atexit
 import json
 import logging
 import requests
 import questdb.ingress as qdb
+import signal
 import textwrap
+import threading
 import time
 from datetime import datetime
+from urllib.parse import urlsplit
+import metrics
+from geocache import GEOHASH_PRECISION, GeocodeCache
+from spool import Spool
 from utils import config
 # ```
 
@@ -32,109 +38,420 @@ logging.basicConfig(
     datefmt='%Y-%m-%d %I:%M:%S %p',
     level=logging.INFO
 )
+
+REQUEST_TIMEOUT = 10        # seconds; per upstream API request
+QDB_HOST = 'localhost'
+QDB_PORT = 9009
+QDB_HTTP_PORT = 9000        # QuestDB REST API; used for DDL
+FLUSH_ROWS = 60             # flush the QuestDB sender after this many rows...
+FLUSH_INTERVAL = 5.0        # ...or after this many seconds, whichever is first
+SAMPLE_INTERVAL = 60.0      # seconds between samples in daemon mode
+MIN_SAMPLE_INTERVAL = 1.0
+SYMBOLS = ('name',)         # iss_tracker columns written as ILP symbols (one per satellite)
+SATELLITE_NAMES = {25544: 'iss'}    # NORAD id -> `name` symbol, the key rows are stored under
 # ```
 
 
 ###### Helper functions
 # ```Python
-def time_this(func):
-    """Return function runtime; timing decorator"""
-    def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        logging.info(f"Time taken by {func.__name__}: {end_time - start_time} seconds")
-        return result
-    return wrapper
-
-
 def unixtime_to_date(timestamp: int) -> str:
     """Converts UNIX timestamp to UTC time in the format YYYY-MM-DD HH:MM:SS+00:00 (UTC)"""
     return datetime.fromtimestamp(timestamp)
 # ```
 
 
+###### HTTP Sessions
+# - One keep-alive `requests.Session` per upstream host, so repeat fetches reuse
+#   the open TCP/TLS connection instead of handshaking on every request.
+# ```Python
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the shared keep-alive session for the url's host"""
+    host = urlsplit(url).netloc
+    if host not in _sessions:
+        with _sessions_lock:
+            if host not in _sessions:
+                _sessions[host] = requests.Session()
+    return _sessions[host]
+
+
+def close_sessions() -> None:
+    """Close all pooled sessions"""
+    while _sessions:
+        _, session = _sessions.popitem()
+        session.close()
+# ```
+
+
 ###### ISS Data Extract
 # - Use to both get current data about the ISS and reverse-geolocating its lat/long.
 # ```Python
-@time_this
-def get_data_from_api(url: str) -> json:
-    """Returns json object result of API data fetch"""
+def get_data_from_api(url: str, stage: str = 'extract', timeout: float = REQUEST_TIMEOUT) -> json:
+    """Returns json object result of API data fetch; timed under `stage`"""
     try:
-        response = requests.get(url)
+        with metrics.timer(stage):
+            response = get_session(url).get(url, timeout=timeout)
         if response.status_code >= 400:
+            metrics.error(f"{stage}_http")
             invalid_request_reason = response.text
             print(f"Your request has failed because: {invalid_request_reason}")
             return {}
         else:
             return response.json()
-    except requests.exceptions.ConnectionError as err:
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+        metrics.error(f"{stage}_connection")
         logging.error(f"Your request has failed because: {err}")
+    except requests.exceptions.RequestException as err:
+        metrics.error(f"{stage}_response")
+        logging.error(f"Invalid response from {urlsplit(url).netloc}: {err}")
+# ```
+
+
+###### Reverse Geocoding Cache
+# - Shared `GeocodeCache` (see `geocache.py`); warmed from `tracking_history.csv` the
+#   first time it is created with an empty store, and closed at exit.
+# - The land cell size can be set with an optional `cache_precision` (geohash length)
+#   in the Geoapify config section; 3 trades address detail (~150 km cells) for
+#   roughly half the Geoapify calls of the default.
+# ```Python
+_geocode_cache = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocode_cache() -> GeocodeCache:
+    """Return the shared reverse-geocoding cache; safe to call from worker threads"""
+    global _geocode_cache
+    if _geocode_cache is None:
+        with _geocode_cache_lock:
+            if _geocode_cache is None:
+                cache = GeocodeCache(precision=int(config["Geoapify"].get("cache_precision", GEOHASH_PRECISION)))
+                if not cache.entries:
+                    cache.warm_from_history()
+                atexit.register(close_geocode_cache)
+                _geocode_cache = cache
+    return _geocode_cache
+
+
+def close_geocode_cache() -> None:
+    """Log cache statistics and close the cache"""
+    global _geocode_cache
+    if _geocode_cache is not None:
+        logging.info(f"Geocode cache stats: {_geocode_cache.stats()}")
+        _geocode_cache.close()
+        _geocode_cache = None
 # ```
 
 
 ###### ISS Data Transform
 # - Convert the unix timestamp from the ISS' about data record to datetime
 # - Add the address at ground-level the ISS is over to the 'about' data record.
+# - Addresses come from the geocode cache; Geoapify is only called on a miss.
 # ```Python
-def transform_iss_data(data: json) -> dict:
-    """Transform ISS data Record"""
+def reverse_geolocate(lat: str, long: str, timeout: float = REQUEST_TIMEOUT) -> json:
+    """Return reverse geolocation details"""
+    REV_GEO_URL = config["Geoapify"]["url"]
+    REV_GEO_KEY = config["Geoapify"]["key"]
+    URL = f"{REV_GEO_URL}?lat={lat}&lon={long}&apiKey={REV_GEO_KEY}"
+    return get_data_from_api(URL, stage='geocode', timeout=timeout)
 
-    def reverse_geolocate(lat: str, long: str) -> json:
-        """Return reverse geolocation details"""
-        REV_GEO_URL = config["Geoapify"]["url"]
-        REV_GEO_KEY = config["Geoapify"]["key"]
-        URL = f"{REV_GEO_URL}?lat={lat}&lon={long}&apiKey={REV_GEO_KEY}"
-        return get_data_from_api(URL)
 
-    def reverse_geolocated_address(data: json) -> str:
-        """Returns formatted address from geolocation data"""
-        try:
-            return data["features"][0]["properties"]["formatted"]
-        except (KeyError, IndexError):
-            logging.error("Invalid geolocation data format")
-            return ""
+def reverse_geolocated_address(data: json) -> str:
+    """Returns formatted address from geolocation data"""
+    try:
+        return data["features"][0]["properties"]["formatted"]
+    except (KeyError, IndexError, TypeError):
+        logging.error("Invalid geolocation data format")
+        return ""
+
+
+def geolocate_address(lat: str, long: str, timeout: float = REQUEST_TIMEOUT) -> str:
+    """Return the address at lat/long from Geoapify (uncached)"""
+    return reverse_geolocated_address(reverse_geolocate(lat, long, timeout))
 
-    data['timestamp'] = unixtime_to_date(data['timestamp'])
+
+def transform_iss_data(data: json) -> dict:
+    """Transform ISS data Record; only the row shaping is timed as `transform`, not the geocode"""
+    with metrics.timer('transform'):
+        data['timestamp'] = unixtime_to_date(data['timestamp'])
     logging.info("Reverse Geolocate ISS Lat/Long")
-    geo_data = reverse_geolocate(data['latitude'], data['longitude'])
-    address = reverse_geolocated_address(geo_data)
+    address = get_geocode_cache().address(
+        data['latitude'], data['longitude'],
+        lambda: geolocate_address(data['latitude'], data['longitude']))
     data['geolocated_address'] = address
     return data
 # ```
 
 
+###### Write Spool
+# - Shared `Spool` (see `spool.py`); queued rows are written out at exit.
+# ```Python
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_spool() -> Spool:
+    """Return the shared write spool; safe to call from worker threads"""
+    global _spool
+    if _spool is None:
+        with _spool_lock:
+            if _spool is None:
+                _spool = Spool()
+                atexit.register(close_spool)
+    return _spool
+
+
+def close_spool() -> None:
+    """Write out queued rows and stop the spool threads"""
+    global _spool
+    if _spool is not None:
+        _spool.close()
+        _spool = None
+# ```
+
+
 ###### ISS Data Load
 # - Writes the data to the local time-series database (`QuestDB`)
 # - Script source: `https://py-questdb-client.readthedocs.io/en/latest/`
+# - `ISSDataLoader` keeps one long-lived sender open and flushes by row count
+#   and by time; a loader-less call still writes the row on its own connection.
+# - Loader calls are serialised by a lock, so it can be shared between threads.
+# - Satellite `name` is written as a symbol column, so rows from several satellites
+#   share one table and can be filtered (and deduplicated) per satellite. A table
+#   created before this with `name` as a string column can be converted with
+#   `ALTER TABLE iss_tracker ALTER COLUMN name TYPE SYMBOL`.
+# - Row listeners (see `stream.py`) see every row as it is buffered, before the flush.
+# - Rows that fail to send are kept in the on-disk spool (see `spool.py`) and
+#   replayed once QuestDB is reachable: in the background for a loader, or after the
+#   next successful write for loader-less calls.
 # ```Python
-def load_iss_data(data: dict) -> None:
+_row_listeners = []
+
+
+def add_row_listener(callback) -> None:
+    """Call `callback(row)` for every row handed to QuestDB (e.g. to stream it live)"""
+    _row_listeners.append(callback)
+
+
+def notify_row_listeners(data: dict) -> None:
+    for callback in _row_listeners:
+        callback(data)
+
+
+def add_row(target, data: dict) -> None:
+    """Add one iss_tracker row to a `qdb.Buffer` or `qdb.Sender`; SYMBOLS go in as symbols"""
+    target.row(
+        'iss_tracker',
+        symbols={key: str(data[key]) for key in SYMBOLS if data.get(key) is not None},
+        columns={key: value for key, value in data.items() if key not in SYMBOLS},
+        at=data['timestamp'])
+
+
+class ISSDataLoader:
+    """Long-lived QuestDB sender; flushes every `flush_rows` rows or `flush_interval` seconds"""
+
+    def __init__(self, host: str = QDB_HOST, port: int = QDB_PORT,
+                 flush_rows: int = FLUSH_ROWS, flush_interval: float = FLUSH_INTERVAL):
+        self.host = host
+        self.port = port
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.sender = None
+        self.buffer = qdb.Buffer()
+        self.pending_rows = 0
+        self.flushed_rows = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.RLock()
+        get_spool().start_replayer(host, port)
+
+    def connect(self) -> None:
+        """Open the sender if it is not already connected"""
+        if self.sender is None:
+            sender = qdb.Sender(self.host, self.port, auto_flush=False)
+            sender.connect()
+            self.sender = sender
+
+    def row(self, data: dict) -> None:
+        """Buffer one ISS record, flushing if a row or time threshold is reached"""
+        with self.lock:
+            try:
+                with metrics.timer('load'):
+                    add_row(self.buffer, data)
+                self.pending_rows += 1
+                notify_row_listeners(data)
+            except qdb.IngressError as e:
+                metrics.error('load')
+                logging.error(f"{e}")
+                return
+            self.flush_if_due()
+
+    def flush_if_due(self) -> None:
+        """Flush when enough rows are pending or the flush interval has elapsed"""
+        with self.lock:
+            elapsed = time.monotonic() - self.last_flush
+            if self.pending_rows and (self.pending_rows >= self.flush_rows or elapsed >= self.flush_interval):
+                self.flush()
+
+    def flush(self) -> None:
+        """Send all buffered rows; rows that cannot be sent go to the spool"""
+        with self.lock:
+            if not self.pending_rows:
+                return
+            pending = str(self.buffer)
+            try:
+                logging.info(f"Flush {self.pending_rows} row(s) to QuestDB")
+                with metrics.timer('flush'):
+                    self.connect()
+                    self.sender.flush(self.buffer)
+                metrics.counter('rows_loaded_total').inc(self.pending_rows)
+                self.flushed_rows += self.pending_rows
+            except qdb.IngressError as e:
+                metrics.error('flush')
+                logging.error(f"{e}")
+                logging.warning(f"Spooling {self.pending_rows} row(s) for replay")
+                get_spool().append(pending)
+                metrics.counter('rows_spooled_total').inc(self.pending_rows)
+                self.reset()
+            self.buffer.clear()
+            self.pending_rows = 0
+            self.last_flush = time.monotonic()
+
+    def reset(self) -> None:
+        """Drop a broken connection; the next flush reconnects"""
+        with self.lock:
+            if self.sender is not None:
+                try:
+                    self.sender.close(flush=False)
+                except qdb.IngressError:
+                    pass
+            self.sender = None
+
+    def close(self) -> None:
+        """Flush pending rows and close the connection"""
+        with self.lock:
+            self.flush()
+            self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def load_iss_data(data: dict, loader: ISSDataLoader = None) -> None:
     """Write data to (local) Time-series DB"""
+    if loader is not None:
+        loader.row(data)
+        return
+    buffer = qdb.Buffer()
     try:
-        with qdb.Sender('localhost', 9009) as sender:
-            sender.row(
-                'iss_tracker',
-                columns=data,
-                at=data['timestamp'])
-            pending = str(sender)
+        with metrics.timer('load'):
+            add_row(buffer, data)
+        notify_row_listeners(data)
+        pending = str(buffer)
+        with metrics.timer('flush'), qdb.Sender(QDB_HOST, QDB_PORT) as sender:
             logging.info('About to flush:\n%s', textwrap.indent(pending, '    '))
-            sender.flush()
+            sender.flush(buffer)
+        metrics.counter('rows_loaded_total').inc()
     except qdb.IngressError as e:
+        metrics.error('flush')
         logging.error(f"{e}")
+        if len(buffer):
+            logging.warning("Spooling row for replay")
+            get_spool().append(str(buffer))
+            metrics.counter('rows_spooled_total').inc()
+        return
+    get_spool().replay(QDB_HOST, QDB_PORT)
+
+
+def enable_dedup(table: str = 'iss_tracker') -> bool:
+    """Make re-sent rows replace rows with the same timestamp and satellite; False on failure"""
+    query = f"ALTER TABLE {table} DEDUP ENABLE UPSERT KEYS(timestamp, {', '.join(SYMBOLS)})"
+    try:
+        response = requests.get(f"http://{QDB_HOST}:{QDB_HTTP_PORT}/exec",
+                                params={'query': query}, timeout=REQUEST_TIMEOUT)
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+        logging.error(f"Could not enable deduplication on {table}: {err}")
+        return False
+    if response.status_code >= 400:
+        logging.warning(f"Could not enable deduplication on {table}: {response.text}")
+        return False
+    return True
 # ```
 
 
 ###### ISS Data ETL (main-entry-point)
 # ```Python
-def extract_transform_load() -> None:
+def extract_transform_load(loader: ISSDataLoader = None) -> None:
     logging.info("Fetch ISS data")
     WIS_ISS_URL = config["Where-is-ISS"]["url"]
     iss_data = get_data_from_api(WIS_ISS_URL)
     if iss_data:
+        iss_data['source'] = 'api'
         logging.info("Transform ISS data")
         iss_data_transform = transform_iss_data(iss_data)
         logging.info("Load ISS data")
-        load_iss_data(iss_data_transform)
+        load_iss_data(iss_data_transform, loader)
     else:
         logging.error("No data received")
 # ```
+
+
+###### ISS Data ETL Daemon
+# - Runs `extract_transform_load` (or another `etl(loader)` source, such as the orbit
+#   propagator) every `interval` seconds in one long-lived process.
+# - Ticks are scheduled against a fixed monotonic start time, so a slow run does not
+#   push later samples back; ticks that are already missed are skipped, not bunched.
+# - A sample that raises is logged and counted, and the schedule carries on; one bad
+#   response costs one sample, not the daemon.
+# - SIGTERM/SIGINT stop the loop; `on_stop` (e.g. to fetch a partial batch) runs and
+#   pending rows are flushed before exit.
+# ```Python
+def run_daemon(interval: float = SAMPLE_INTERVAL, flush_rows: int = FLUSH_ROWS,
+               flush_interval: float = FLUSH_INTERVAL, etl=extract_transform_load,
+               on_stop=None) -> None:
+    """Run `etl(loader)` every `interval` seconds until SIGTERM/SIGINT, then `on_stop(loader)`"""
+    if interval < MIN_SAMPLE_INTERVAL:
+        raise ValueError(f"Sample interval must be at least {MIN_SAMPLE_INTERVAL} second(s)")
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        logging.info(f"Received {signal.Signals(signum).name}, shutting down")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    logging.info(f"Start ISS tracker daemon; sample interval {interval} seconds")
+    start = time.monotonic()
+    tick = 0
+    with ISSDataLoader(flush_rows=flush_rows, flush_interval=flush_interval) as loader:
+        try:
+            while not stop.is_set():
+                try:
+                    etl(loader)
+                except Exception:
+                    metrics.error('etl')
+                    logging.exception("Sample failed; continuing with the next tick")
+                tick += 1
+                now = time.monotonic()
+                missed = int((now - start) // interval) - tick + 1
+                if missed > 0:
+                    metrics.counter('samples_skipped_total').inc(missed)
+                    logging.warning(f"Sample overran the interval; skipping {missed} tick(s)")
+                    tick += missed
+                next_run = start + tick * interval
+                while not stop.is_set():
+                    remaining = next_run - time.monotonic()
+                    if remaining <= 0 or stop.wait(min(remaining, loader.flush_interval)):
+                        break
+                    loader.flush_if_due()
+        finally:
+            if on_stop is not None:
+                on_stop(loader)
+            close_sessions()
+    logging.info("ISS tracker daemon stopped")
+# ```
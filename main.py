@@ -1,7 +1,109 @@
-from iss_tracker import extract_transform_load
+import argparse
+from datetime import datetime, timedelta, timezone
+from iss_tracker import (FLUSH_INTERVAL, FLUSH_ROWS, MIN_SAMPLE_INTERVAL, SAMPLE_INTERVAL,
+                         add_row_listener, extract_transform_load, run_daemon)
+from metrics import start_metrics_server
+from analytics import MAX_GAP, RegionIndex, load_csv, load_questdb, load_regions, print_summary, summarize
+from backfill import BATCH_SIZE, import_history
+from orbit import DRIFT_CHECK, OrbitTracker, load_tle, predict_passes
+from pipeline import run_async_daemon
+from satellites import GAP_STEP, ISS, POSITIONS_BATCH, SatelliteTracker, fill_gaps, satellite_name
+from stream import start_stream_server
+
+
+def utc_datetime(text: str) -> datetime:
+    """Parse an ISO date/time; times without an offset are UTC"""
+    moment = datetime.fromisoformat(text)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Track the ISS and load its position into QuestDB")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running and sample on a fixed interval instead of once")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="in daemon mode, run capture, geocode and load as separate asyncio stages")
+    parser.add_argument('--orbit', action='store_true',
+                        help="in daemon mode, propagate positions locally from a TLE and only "
+                             "call the API to check for drift")
+    parser.add_argument('--tle', metavar='FILE',
+                        help="TLE file for --orbit/passes (default: fetch the current TLE)")
+    parser.add_argument('--drift-check', type=float, default=DRIFT_CHECK,
+                        help="seconds between API drift checks with --orbit (default %(default)s)")
+    parser.add_argument('--satellites', type=int, nargs='+', metavar='ID',
+                        help="NORAD ids to track through the bulk positions endpoint (e.g. 25544)")
+    parser.add_argument('--batch', type=int, default=1,
+                        help=f"with --satellites, fetch this many samples per request "
+                             f"(max {POSITIONS_BATCH}, default %(default)s; adds up to N intervals of lag)")
+    parser.add_argument('--interval', type=float, default=SAMPLE_INTERVAL,
+                        help=f"seconds between samples in daemon mode (min {MIN_SAMPLE_INTERVAL:g}, default %(default)s)")
+    parser.add_argument('--flush-rows', type=int, default=FLUSH_ROWS,
+                        help="flush to QuestDB after this many rows (default %(default)s)")
+    parser.add_argument('--flush-interval', type=float, default=FLUSH_INTERVAL,
+                        help="flush to QuestDB after this many seconds (default %(default)s)")
+    parser.add_argument('--metrics-port', type=int,
+                        help="serve Prometheus /metrics and /metrics.json on this port")
+    parser.add_argument('--serve', type=int, metavar='PORT',
+                        help="in daemon mode, stream new positions to web viewers (SSE) on this port")
+    parser.add_argument('--serve-host', default='127.0.0.1',
+                        help="address for --serve (default %(default)s)")
+    subparsers = parser.add_subparsers(dest='command')
+    import_parser = subparsers.add_parser('import', help="bulk-load history dumps into QuestDB")
+    import_parser.add_argument('paths', nargs='+', metavar='FILE',
+                               help="timestamp;name;lat,lon;address file (plain or .gz)")
+    import_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                               help="rows per flush (default %(default)s)")
+    import_parser.add_argument('--delimiter', default=';',
+                               help="field delimiter (default %(default)r)")
+    passes_parser = subparsers.add_parser('passes', help="predict ISS passes over a location")
+    passes_parser.add_argument('latitude', type=float)
+    passes_parser.add_argument('longitude', type=float)
+    passes_parser.add_argument('--hours', type=float, default=24.0,
+                               help="how far ahead to look (default %(default)s)")
+    passes_parser.add_argument('--min-elevation', type=float, default=10.0,
+                               help="degrees above the horizon (default %(default)s)")
+    passes_parser.add_argument('--tle', metavar='FILE', default=argparse.SUPPRESS,
+                               help="TLE file (default: fetch the current TLE)")
+    gaps_parser = subparsers.add_parser('fill-gaps', help="fetch positions missing from QuestDB")
+    gaps_parser.add_argument('--hours', type=float, default=24.0,
+                             help="look back N hours (default %(default)s)")
+    gaps_parser.add_argument('--start', type=utc_datetime,
+                             help="UTC start time, overrides --hours (e.g. 2024-01-08T00:00)")
+    gaps_parser.add_argument('--end', type=utc_datetime, help="UTC end time (default: now)")
+    gaps_parser.add_argument('--step', type=float, default=GAP_STEP,
+                             help="expected seconds between samples (default %(default)s)")
+    gaps_parser.add_argument('--satellites', type=int, nargs='+', metavar='ID', default=argparse.SUPPRESS,
+                             help=f"NORAD ids to fill (default {ISS})")
+    analyze_parser = subparsers.add_parser('analyze', help="summarise stored positions and region passes")
+    analyze_parser.add_argument('--csv', metavar='FILE',
+                                help="read a history dump instead of the iss_tracker table")
+    analyze_parser.add_argument('--hours', type=float, default=24.0,
+                                help="analyse the last N hours (default %(default)s)")
+    analyze_parser.add_argument('--start', type=utc_datetime,
+                                help="UTC start time, overrides --hours (e.g. 2024-01-08T00:00)")
+    analyze_parser.add_argument('--end', type=utc_datetime, help="UTC end time (default: now)")
+    analyze_parser.add_argument('--satellite', type=int, metavar='ID', default=ISS,
+                                help="NORAD id of the satellite to analyse (default %(default)s, the ISS)")
+    analyze_parser.add_argument('--regions', metavar='FILE',
+                                help="JSON file of bbox/polygon regions to report passes over")
+    analyze_parser.add_argument('--max-gap', type=float, default=MAX_GAP,
+                                help="seconds; longer steps count as gaps (default %(default)s)")
+    args = parser.parse_args()
+    if args.orbit and args.use_async:
+        parser.error("--orbit cannot be combined with --async")
+    if args.satellites and (args.orbit or args.use_async):
+        parser.error("--satellites cannot be combined with --orbit or --async")
+    if args.serve is not None and not args.daemon:
+        parser.error("--serve needs --daemon")
+    if not 1 <= args.batch <= POSITIONS_BATCH:
+        parser.error(f"--batch must be between 1 and {POSITIONS_BATCH}")
+    if args.interval < MIN_SAMPLE_INTERVAL:
+        parser.error(f"--interval must be at least {MIN_SAMPLE_INTERVAL:g} second(s)")
+    return args
 
 
 if __name__ == "__main__":
+    args = parse_args()
     header = '''
  __     ______     ______
 /\ \   /\  ___\   /\  ___\\
@@ -16,4 +118,52 @@ if __name__ == "__main__":
     \/_/   \/_/ /_/   \/_/\/_/   \/_____/   \/_/\/_/   \/_____/   \/_/ /_/
 '''
     print(f"{header}")
-    extract_transform_load()
+    tle = open(args.tle).read() if args.tle else None
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    if args.serve is not None:
+        add_row_listener(start_stream_server(args.serve, args.serve_host).publish)
+    if args.command == 'import':
+        for path in args.paths:
+            import_history(path, args.batch_size, args.delimiter)
+    elif args.command == 'passes':
+        for iss_pass in predict_passes(load_tle(tle), args.latitude, args.longitude,
+                                       hours=args.hours, min_elevation=args.min_elevation):
+            print(f"{datetime.fromtimestamp(iss_pass['rise']):%Y-%m-%d %H:%M:%S}  "
+                  f"max {iss_pass['max_elevation']:5.1f}° at "
+                  f"{datetime.fromtimestamp(iss_pass['culmination']):%H:%M:%S}  "
+                  f"set {datetime.fromtimestamp(iss_pass['set']):%H:%M:%S}")
+    elif args.command == 'fill-gaps':
+        end = args.end or datetime.now(timezone.utc)
+        start = args.start or end - timedelta(hours=args.hours)
+        fill_gaps(args.satellites or [ISS], start.timestamp(), end.timestamp(), args.step)
+    elif args.command == 'analyze':
+        end = args.end or datetime.now(timezone.utc)
+        start = args.start or end - timedelta(hours=args.hours)
+        try:
+            satellite = satellite_name(args.satellite)
+        except ValueError as err:
+            raise SystemExit(f"analyze: {err}")
+        if args.csv:
+            track = load_csv(args.csv, start, end, satellite=satellite)
+        else:
+            track = load_questdb(start, end, satellite)
+        index = RegionIndex(load_regions(args.regions)) if args.regions else None
+        print_summary(summarize(track, index, args.max_gap))
+    elif args.satellites:
+        tracker = SatelliteTracker(args.satellites, batch=args.batch)
+        if args.daemon:
+            run_daemon(args.interval, args.flush_rows, args.flush_interval,
+                       etl=tracker.extract_transform_load, on_stop=tracker.flush)
+        else:
+            tracker.extract_transform_load()
+            tracker.flush()
+    elif args.daemon and args.orbit:
+        tracker = OrbitTracker(tle, drift_check=args.drift_check)
+        run_daemon(args.interval, args.flush_rows, args.flush_interval, etl=tracker.extract_transform_load)
+    elif args.daemon and args.use_async:
+        run_async_daemon(args.interval, args.flush_rows, args.flush_interval)
+    elif args.daemon:
+        run_daemon(args.interval, args.flush_rows, args.flush_interval)
+    else:
+        extract_transform_load()
@@ -0,0 +1,240 @@
+#### *ISS Tracker - Metrics*
+
+
+###### Overview
+# - In-process counters and latency histograms for each ETL stage
+#   (extract, geocode, transform, load, flush), replacing free-text timing logs.
+# - Other modules count into the same registry, e.g. the geocode cache's hits,
+#   offline (ocean) hits, misses and seconds saved.
+# - Histograms keep Prometheus-style cumulative buckets plus a bounded window of
+#   recent samples for p50/p99.
+# - `snapshot()` returns everything as a dict; `prometheus_text()` renders the text
+#   exposition format; `start_metrics_server()` serves both over HTTP
+#   (`/metrics` and `/metrics.json`).
+
+
+###### Dependencies
+# ```Python
+import bisect
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+# ```
+
+
+###### Configurations
+# ```Python
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WINDOW = 4096               # recent samples kept per histogram for quantiles
+PREFIX = 'iss_tracker'
+# ```
+
+
+###### Metric Types
+# ```Python
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self.lock:
+            self.value += amount
+
+
+class Histogram:
+    """Latency histogram with cumulative buckets and a window for quantiles"""
+
+    def __init__(self, buckets: tuple = BUCKETS, window: int = WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.recent.append(value)
+
+    def quantile(self, q: float) -> float:
+        """Return the q-quantile (0..1) of the recent window"""
+        with self.lock:
+            ordered = sorted(self.recent)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            count, total = self.count, self.sum
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else 0.0,
+            'p50': self.quantile(0.50),
+            'p99': self.quantile(0.99),
+        }
+# ```
+
+
+###### Registry
+# - Metrics are keyed by name and an optional single label (e.g. `stage="extract"`).
+# ```Python
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+def counter(name: str, **label) -> Counter:
+    """Return the counter `name`, creating it on first use"""
+    key = (name, tuple(label.items()))
+    with _lock:
+        if key not in _counters:
+            _counters[key] = Counter()
+        return _counters[key]
+
+
+def histogram(name: str, **label) -> Histogram:
+    """Return the histogram `name`, creating it on first use"""
+    key = (name, tuple(label.items()))
+    with _lock:
+        if key not in _histograms:
+            _histograms[key] = Histogram()
+        return _histograms[key]
+
+
+def stage_histogram(stage: str) -> Histogram:
+    """Return the latency histogram of an ETL stage"""
+    return histogram('stage_seconds', stage=stage)
+
+
+def error(kind: str) -> None:
+    """Count one error of the given kind"""
+    counter('errors_total', kind=kind).inc()
+
+
+def retry(kind: str) -> None:
+    """Count one retry of the given kind"""
+    counter('retries_total', kind=kind).inc()
+
+
+@contextmanager
+def timer(stage: str):
+    """Time the enclosed block into the stage's histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_histogram(stage).observe(time.perf_counter() - start)
+
+
+def timed(stage: str):
+    """Decorator form of `timer`"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def reset() -> None:
+    """Drop all metrics"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+# ```
+
+
+###### Export
+# ```Python
+def _key(name: str, label: tuple) -> str:
+    return name + ''.join(f"{{{k}={v}}}" for k, v in label)
+
+
+def snapshot() -> dict:
+    """Return all counters and histogram summaries"""
+    with _lock:
+        counters, histograms = list(_counters.items()), list(_histograms.items())
+    return {
+        'counters': {_key(name, label): c.value for (name, label), c in counters},
+        'histograms': {_key(name, label): h.snapshot() for (name, label), h in histograms},
+    }
+
+
+def _labels(label: tuple, extra: str = '') -> str:
+    parts = [f'{k}="{v}"' for k, v in label] + ([extra] if extra else [])
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def prometheus_text() -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    with _lock:
+        counters, histograms = sorted(_counters.items()), sorted(_histograms.items())
+    lines, typed = [], set()
+    for (name, label), c in counters:
+        metric = f"{PREFIX}_{name}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_labels(label)} {c.value}")
+    for (name, label), h in histograms:
+        metric = f"{PREFIX}_{name}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        with h.lock:
+            counts, count, total = list(h.counts), h.count, h.sum
+        cumulative = 0
+        for bound, n in zip(h.buckets + (float('inf'),), counts):
+            cumulative += n
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            bucket = 'le="' + le + '"'
+            lines.append(f"{metric}_bucket{_labels(label, bucket)} {cumulative}")
+        lines.append(f"{metric}_sum{_labels(label)} {total}")
+        lines.append(f"{metric}_count{_labels(label)} {count}")
+    return '\n'.join(lines) + '\n'
+# ```
+
+
+###### Metrics Endpoint
+# ```Python
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = prometheus_text().encode(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = json.dumps(snapshot()).encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Serve /metrics and /metrics.json from a background thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+# ```
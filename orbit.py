@@ -0,0 +1,279 @@
+#### *ISS Tracker - Orbit Propagation*
+
+
+###### Overview
+# - Propagates the ISS orbit locally from a TLE with SGP4, so positions can be
+#   produced without a round trip to wheretheiss.at for every sample.
+# - All propagation is vectorised with NumPy: one call handles thousands of
+#   timestamps (ground tracks, pass prediction, densifying real samples).
+# - `OrbitTracker` plugs into the daemon in place of `extract_transform_load`: it
+#   loads propagated rows (`source='sgp4'`) through the usual transform/load path
+#   and only calls the API every `drift_check` seconds to measure drift, refreshing
+#   the TLE when it is stale or the drift is too large.
+# - Frames: SGP4 gives TEME; it is rotated to Earth-fixed by GMST (polar motion and
+#   UT1-UTC are ignored, ~tens of metres) and converted to WGS84 geodetic.
+
+
+###### Dependencies
+# ```Python
+import logging
+import metrics
+import numpy as np
+import time
+from sgp4.api import Satrec, SatrecArray
+from iss_tracker import (get_data_from_api, load_iss_data, transform_iss_data)
+from utils import config
+# ```
+
+
+###### Configurations
+# ```Python
+WGS84_A = 6378.137                      # km
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+WGS84_E2 = WGS84_F * (2 - WGS84_F)
+EARTH_RADIUS = 6371.0088                # km; mean radius for great-circle distances
+UNIX_J2000 = 946728000.0                # 2000-01-01 12:00:00 UTC
+UNIX_JD = 2440587.5                     # Julian date of the Unix epoch
+DRIFT_CHECK = 600.0                     # seconds between API drift checks
+MAX_DRIFT = 25.0                        # km; refresh the TLE beyond this
+MAX_TLE_AGE = 12 * 3600.0               # seconds; refresh the TLE after this
+PASS_STEP = 10.0                        # seconds; pass-prediction resolution
+# ```
+
+
+###### TLE
+# - wheretheiss.at serves the current TLE next to the position endpoint.
+# ```Python
+def fetch_tle(url: str = None) -> tuple:
+    """Return (line1, line2) of the current TLE from wheretheiss.at"""
+    url = url or f"{config['Where-is-ISS']['url'].rstrip('/')}/tles"
+    data = get_data_from_api(url, stage='tle')
+    if not data:
+        raise ValueError(f"No TLE received from {url}")
+    return data['line1'], data['line2']
+
+
+def load_tle(lines) -> Satrec:
+    """Return an SGP4 satellite record from TLE lines, a TLE text block, or fetch one if None"""
+    if lines is None:
+        lines = fetch_tle()
+    if isinstance(lines, str):
+        lines = lines.strip().splitlines()
+    line1, line2 = [line.strip() for line in lines if line.strip()][-2:]
+    return Satrec.twoline2rv(line1, line2)
+
+
+def tle_epoch(sat: Satrec) -> float:
+    """Return the TLE epoch as a Unix timestamp"""
+    return (sat.jdsatepoch - UNIX_JD + sat.jdsatepochF) * 86400.0
+# ```
+
+
+###### Propagation
+# ```Python
+def _julian_dates(timestamps: np.ndarray) -> tuple:
+    """Split Unix timestamps into whole/fractional Julian dates for sgp4"""
+    days, seconds = np.divmod(np.asarray(timestamps, dtype=np.float64), 86400.0)
+    return UNIX_JD + days, seconds / 86400.0
+
+
+def gmst(timestamps: np.ndarray) -> np.ndarray:
+    """Greenwich mean sidereal time (IAU 1982) in radians"""
+    t = (np.asarray(timestamps, dtype=np.float64) - UNIX_J2000) / 86400.0 / 36525.0
+    seconds = 67310.54841 + (876600.0 * 3600.0 + 8640184.812866) * t + 0.093104 * t**2 - 6.2e-6 * t**3
+    return np.radians(np.mod(seconds, 86400.0) / 240.0)
+
+
+def teme_to_geodetic(r: np.ndarray, timestamps: np.ndarray) -> tuple:
+    """Convert TEME positions (N x 3, km) to WGS84 latitude/longitude (degrees) and altitude (km)"""
+    theta = gmst(timestamps)
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    x = cos_t * r[:, 0] + sin_t * r[:, 1]
+    y = -sin_t * r[:, 0] + cos_t * r[:, 1]
+    z = r[:, 2]
+    # Bowring's method; sub-metre accuracy at LEO altitudes
+    p = np.hypot(x, y)
+    beta = np.arctan2(z * WGS84_A, p * WGS84_B)
+    ep2 = (WGS84_A**2 - WGS84_B**2) / WGS84_B**2
+    lat = np.arctan2(z + ep2 * WGS84_B * np.sin(beta)**3, p - WGS84_E2 * WGS84_A * np.cos(beta)**3)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(lat)**2)
+    alt = p / np.cos(lat) - n
+    return np.degrees(lat), np.degrees(np.arctan2(y, x)), alt
+
+
+def propagate_teme(sat: Satrec, timestamps: np.ndarray) -> tuple:
+    """Return TEME position and velocity (N x 3, km and km/s) at Unix timestamps"""
+    jd, fr = _julian_dates(timestamps)
+    errors, r, v = SatrecArray([sat]).sgp4(jd, fr)
+    if errors.any():
+        logging.warning(f"SGP4 failed for {int(np.count_nonzero(errors))} of {errors.size} timestamp(s)")
+    return r[0], v[0]
+
+
+def propagate(sat: Satrec, timestamps) -> dict:
+    """Return latitude/longitude (degrees), altitude (km) and velocity (km/h) arrays at Unix timestamps"""
+    timestamps = np.atleast_1d(np.asarray(timestamps, dtype=np.float64))
+    r, v = propagate_teme(sat, timestamps)
+    lat, lon, alt = teme_to_geodetic(r, timestamps)
+    return {
+        'timestamp': timestamps,
+        'latitude': lat,
+        'longitude': lon,
+        'altitude': alt,
+        'velocity': np.linalg.norm(v, axis=1) * 3600.0,
+    }
+
+
+def ground_track(sat: Satrec, start: float, end: float, step: float = 60.0) -> dict:
+    """Return propagated positions from `start` to `end` (Unix seconds) every `step` seconds"""
+    return propagate(sat, np.arange(start, end, step))
+# ```
+
+
+###### Interpolation
+# - Densifies real samples: the SGP4 track is corrected by the residual between the
+#   real samples and the model, interpolated linearly in time. Between samples the
+#   result follows the orbit's shape; at samples it matches the real data exactly.
+# ```Python
+def _wrap_degrees(angle: np.ndarray) -> np.ndarray:
+    return (np.asarray(angle) + 180.0) % 360.0 - 180.0
+
+
+def interpolate(sat: Satrec, sample_times, sample_lat, sample_lon, timestamps) -> dict:
+    """Return positions at `timestamps` anchored to real samples taken at `sample_times`"""
+    sample_times = np.asarray(sample_times, dtype=np.float64)
+    model = propagate(sat, sample_times)
+    lat_residual = np.asarray(sample_lat, dtype=np.float64) - model['latitude']
+    lon_residual = _wrap_degrees(np.asarray(sample_lon, dtype=np.float64) - model['longitude'])
+    dense = propagate(sat, timestamps)
+    dense['latitude'] = dense['latitude'] + np.interp(dense['timestamp'], sample_times, lat_residual)
+    dense['longitude'] = _wrap_degrees(
+        dense['longitude'] + np.interp(dense['timestamp'], sample_times, lon_residual))
+    return dense
+# ```
+
+
+###### Pass Prediction
+# ```Python
+def observer_ecef(lat: float, lon: float, alt: float = 0.0) -> tuple:
+    """Return the observer's Earth-fixed position (km) and local 'up' unit vector"""
+    phi, lam = np.radians(lat), np.radians(lon)
+    n = WGS84_A / np.sqrt(1 - WGS84_E2 * np.sin(phi)**2)
+    position = np.array([(n + alt) * np.cos(phi) * np.cos(lam),
+                         (n + alt) * np.cos(phi) * np.sin(lam),
+                         (n * (1 - WGS84_E2) + alt) * np.sin(phi)])
+    up = np.array([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)])
+    return position, up
+
+
+def elevations(sat: Satrec, lat: float, lon: float, timestamps: np.ndarray, alt: float = 0.0) -> np.ndarray:
+    """Return the ISS elevation angle (degrees) seen from lat/lon at each timestamp"""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    r, _ = propagate_teme(sat, timestamps)
+    theta = gmst(timestamps)
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    ecef = np.column_stack((cos_t * r[:, 0] + sin_t * r[:, 1], -sin_t * r[:, 0] + cos_t * r[:, 1], r[:, 2]))
+    position, up = observer_ecef(lat, lon, alt)
+    rng = ecef - position
+    return np.degrees(np.arcsin(rng @ up / np.linalg.norm(rng, axis=1)))
+
+
+def predict_passes(sat: Satrec, lat: float, lon: float, start: float = None, hours: float = 24.0,
+                   min_elevation: float = 10.0, step: float = PASS_STEP) -> list:
+    """Return passes over lat/lon as dicts of rise/culmination/set times and max elevation"""
+    start = time.time() if start is None else start
+    timestamps = np.arange(start, start + hours * 3600.0, step)
+    elevation = elevations(sat, lat, lon, timestamps)
+    visible = np.concatenate(([False], elevation >= min_elevation, [False]))
+    edges = np.flatnonzero(np.diff(visible.astype(np.int8)))
+    passes = []
+    for rise, set_ in zip(edges[::2], edges[1::2]):
+        peak = rise + int(np.argmax(elevation[rise:set_]))
+        passes.append({
+            'rise': float(timestamps[rise]),
+            'culmination': float(timestamps[peak]),
+            'set': float(timestamps[set_ - 1]),
+            'max_elevation': float(elevation[peak]),
+        })
+    return passes
+# ```
+
+
+###### Orbit Tracker (daemon source)
+# ```Python
+def great_circle_km(lat1, lon1, lat2, lon2):
+    """Haversine distance in km; works on scalars or arrays"""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi, dlam = phi2 - phi1, np.radians(np.asarray(lon2) - np.asarray(lon1))
+    h = np.sin(dphi / 2)**2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2)**2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(h))
+
+
+class OrbitTracker:
+    """Produces propagated ISS rows, checking against the API every `drift_check` seconds"""
+
+    def __init__(self, tle=None, drift_check: float = DRIFT_CHECK, max_drift: float = MAX_DRIFT,
+                 max_tle_age: float = MAX_TLE_AGE):
+        self.tle = tle
+        self.drift_check = drift_check
+        self.max_drift = max_drift
+        self.max_tle_age = max_tle_age
+        self.sat = load_tle(tle)
+        self.last_check = None
+
+    def refresh_tle(self) -> None:
+        """Fetch a fresh TLE (unless a fixed one was supplied)"""
+        if self.tle is not None:
+            logging.warning("Using a fixed TLE; not refreshing")
+            return
+        try:
+            metrics.retry('tle_refresh')
+            self.sat = load_tle(None)
+            logging.info(f"Loaded TLE with epoch {time.ctime(tle_epoch(self.sat))}")
+        except (ValueError, KeyError) as err:
+            logging.error(f"Could not refresh TLE: {err}")
+
+    def check_drift(self, loader=None) -> None:
+        """Compare one API sample with the model; load the sample and refresh the TLE if needed"""
+        self.last_check = time.monotonic()
+        iss_data = get_data_from_api(config["Where-is-ISS"]["url"])
+        if not iss_data:
+            logging.error("No data received for drift check")
+            return
+        model = propagate(self.sat, iss_data['timestamp'])
+        drift = float(great_circle_km(iss_data['latitude'], iss_data['longitude'],
+                                      model['latitude'][0], model['longitude'][0]))
+        tle_age = iss_data['timestamp'] - tle_epoch(self.sat)
+        logging.info(f"Orbit drift {drift:.2f} km; TLE age {tle_age / 3600:.1f} hours")
+        iss_data['source'] = 'api'
+        load_iss_data(transform_iss_data(iss_data), loader)
+        if drift > self.max_drift or tle_age > self.max_tle_age:
+            self.refresh_tle()
+
+    def sample(self, timestamp: float = None) -> dict:
+        """Return a propagated row shaped like the wheretheiss.at response"""
+        timestamp = int(time.time() if timestamp is None else timestamp)
+        model = propagate(self.sat, timestamp)
+        return {
+            'name': 'iss',
+            'id': self.sat.satnum,
+            'latitude': float(model['latitude'][0]),
+            'longitude': float(model['longitude'][0]),
+            'altitude': float(model['altitude'][0]),
+            'velocity': float(model['velocity'][0]),
+            'timestamp': timestamp,
+            'units': 'kilometers',
+            'source': 'sgp4',
+        }
+
+    def extract_transform_load(self, loader=None) -> None:
+        """Drop-in replacement for `iss_tracker.extract_transform_load`"""
+        if self.last_check is None or time.monotonic() - self.last_check >= self.drift_check:
+            self.check_drift(loader)
+            return
+        logging.info("Propagate ISS position")
+        with metrics.timer('propagate'):
+            iss_data = self.sample()
+        load_iss_data(transform_iss_data(iss_data), loader)
+# ```
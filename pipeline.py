@@ -0,0 +1,224 @@
+#### *ISS Tracker - Async ETL Pipeline*
+
+
+###### Overview
+# - Splits the ETL into three asyncio stages joined by bounded queues:
+#   position capture -> reverse geocode -> QuestDB load.
+# - Positions are sampled on a fixed, drift-corrected tick, so a slow Geoapify
+#   response never delays the next position sample.
+# - Re-sent rows replace the original only if the table deduplicates on its
+#   designated timestamp and satellite:
+#       ALTER TABLE iss_tracker DEDUP ENABLE UPSERT KEYS(timestamp, name);
+#   The pipeline enables this at start and, if the table did not exist yet, again
+#   after its first successful flush.
+# - With deduplication on, a row whose address is not already known offline/cached
+#   is written straight away with an empty `geolocated_address` and re-sent once the
+#   address arrives. Without it, the row waits in the geocode stage and is written
+#   once, with or without an address, so no position is ever stored twice.
+# - Blocking calls (`requests`, the QuestDB sender) run in worker threads; each
+#   stage has its own timeout and concurrency limit. Requests time out on their own
+#   before their stage does, so a stage timeout never leaves a request running.
+
+
+###### Dependencies
+# ```Python
+import asyncio
+import logging
+import signal
+import metrics
+from iss_tracker import (FLUSH_INTERVAL, FLUSH_ROWS, MIN_SAMPLE_INTERVAL, SAMPLE_INTERVAL,
+                         ISSDataLoader, close_sessions, enable_dedup, geolocate_address,
+                         get_data_from_api, get_geocode_cache, unixtime_to_date)
+from utils import config
+# ```
+
+
+###### Configurations
+# ```Python
+FETCH_TIMEOUT = 5.0         # seconds; position request
+FETCH_CONCURRENCY = 2       # position fetches in flight; ticks beyond this are skipped
+GEOCODE_TIMEOUT = 10.0      # seconds; Geoapify request
+STAGE_GRACE = 1.0           # seconds a stage waits beyond its request timeout
+GEOCODE_CONCURRENCY = 4     # geocode workers
+LOAD_TIMEOUT = 10.0         # seconds; one sender call
+QUEUE_SIZE = 256            # max items waiting between stages
+# ```
+
+
+###### Stages
+# ```Python
+async def capture_positions(interval: float, load_queue: asyncio.Queue, geocode_queue: asyncio.Queue,
+                            dedup: asyncio.Event, stop: asyncio.Event) -> None:
+    """Fetch the ISS position every `interval` seconds until `stop` is set"""
+    loop = asyncio.get_running_loop()
+    fetch_limit = asyncio.Semaphore(FETCH_CONCURRENCY)
+    in_flight = set()
+    start = loop.time()
+    tick = 0
+    while not stop.is_set():
+        if fetch_limit.locked():
+            metrics.counter('samples_skipped_total').inc()
+            logging.warning("Position fetches are backed up; skipping sample")
+        else:
+            task = asyncio.create_task(capture_position(fetch_limit, load_queue, geocode_queue, dedup))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            task.add_done_callback(log_failure)
+        tick += 1
+        missed = int((loop.time() - start) // interval) - tick + 1
+        if missed > 0:
+            metrics.counter('samples_skipped_total').inc(missed)
+            logging.warning(f"Sample overran the interval; skipping {missed} tick(s)")
+            tick += missed
+        try:
+            await asyncio.wait_for(stop.wait(), start + tick * interval - loop.time())
+        except asyncio.TimeoutError:
+            pass
+    if in_flight:
+        await asyncio.gather(*in_flight, return_exceptions=True)
+
+
+def log_failure(task: asyncio.Task) -> None:
+    """Log a capture task that raised, instead of leaving it unretrieved"""
+    if not task.cancelled() and task.exception() is not None:
+        metrics.error('capture')
+        logging.error("Position capture failed", exc_info=task.exception())
+
+
+async def capture_position(fetch_limit: asyncio.Semaphore, load_queue: asyncio.Queue,
+                           geocode_queue: asyncio.Queue, dedup: asyncio.Event) -> None:
+    """Fetch one position, queue it for loading and, if needed, for geocoding"""
+    async with fetch_limit:
+        logging.info("Fetch ISS data")
+        try:
+            iss_data = await asyncio.wait_for(
+                asyncio.to_thread(get_data_from_api, config["Where-is-ISS"]["url"], 'extract', FETCH_TIMEOUT),
+                FETCH_TIMEOUT + STAGE_GRACE)
+        except asyncio.TimeoutError:
+            metrics.error('extract_timeout')
+            logging.error(f"Position fetch timed out after {FETCH_TIMEOUT} seconds")
+            return
+    if not iss_data:
+        logging.error("No data received")
+        return
+    with metrics.timer('transform'):
+        iss_data['source'] = 'api'
+        iss_data['timestamp'] = unixtime_to_date(iss_data['timestamp'])
+    iss_data['geolocated_address'] = get_geocode_cache().lookup(iss_data['latitude'], iss_data['longitude'])
+    loaded = bool(iss_data['geolocated_address']) or dedup.is_set()
+    if loaded:
+        await load_queue.put(dict(iss_data))
+    if not iss_data['geolocated_address']:
+        try:
+            geocode_queue.put_nowait((iss_data, loaded))
+        except asyncio.QueueFull:
+            metrics.error('geocode_queue_full')
+            logging.warning("Geocode queue is full; row stays without an address")
+            if not loaded:
+                await load_queue.put(iss_data)
+
+
+async def geocode_worker(geocode_queue: asyncio.Queue, load_queue: asyncio.Queue) -> None:
+    """Resolve addresses for queued (row, already loaded) items and queue the rows to load"""
+    cache = get_geocode_cache()
+    while (item := await geocode_queue.get()) is not None:
+        iss_data, loaded = item
+        lat, long = iss_data['latitude'], iss_data['longitude']
+        try:
+            address = await asyncio.wait_for(
+                asyncio.to_thread(cache.address, lat, long, lambda: geolocate_address(lat, long, GEOCODE_TIMEOUT)),
+                GEOCODE_TIMEOUT + STAGE_GRACE)
+        except asyncio.TimeoutError:
+            metrics.error('geocode_timeout')
+            logging.error(f"Reverse geolocation timed out after {GEOCODE_TIMEOUT + STAGE_GRACE} seconds")
+            address = ""
+        except Exception:
+            metrics.error('geocode')
+            logging.exception("Reverse geolocation failed; row keeps an empty address")
+            address = ""
+        if address or not loaded:
+            iss_data['geolocated_address'] = address
+            await load_queue.put(iss_data)
+
+
+async def load_worker(load_queue: asyncio.Queue, loader: ISSDataLoader, dedup: asyncio.Event) -> None:
+    """Write queued rows through the shared loader, flushing on its row/time policy"""
+    retried = dedup.is_set()
+    while True:
+        if not retried and loader.flushed_rows:
+            retried = True
+            await set_dedup(dedup)
+        try:
+            iss_data = await asyncio.wait_for(load_queue.get(), loader.flush_interval)
+        except asyncio.TimeoutError:
+            try:
+                await asyncio.to_thread(loader.flush_if_due)
+            except Exception:
+                metrics.error('flush')
+                logging.exception("Scheduled flush failed")
+            continue
+        if iss_data is None:
+            break
+        logging.info("Load ISS data")
+        try:
+            await asyncio.wait_for(asyncio.to_thread(loader.row, iss_data), LOAD_TIMEOUT)
+        except asyncio.TimeoutError:
+            metrics.error('load_timeout')
+            logging.error(f"QuestDB write timed out after {LOAD_TIMEOUT} seconds")
+        except Exception:
+            metrics.error('load')
+            logging.exception("Could not load row; dropping it")
+    await asyncio.to_thread(loader.close)
+
+
+async def set_dedup(dedup: asyncio.Event) -> None:
+    """Enable deduplication on the table and set `dedup` if it worked"""
+    if await asyncio.to_thread(enable_dedup):
+        dedup.set()
+        logging.info("Deduplication enabled; rows are loaded before their address is known")
+    else:
+        logging.warning("Deduplication unavailable; rows wait for their address before loading")
+# ```
+
+
+###### Pipeline (main-entry-point)
+# - SIGTERM/SIGINT stop sampling; queued geocodes and rows are drained and flushed
+#   before exit.
+# ```Python
+async def run_pipeline(interval: float = SAMPLE_INTERVAL, flush_rows: int = FLUSH_ROWS,
+                       flush_interval: float = FLUSH_INTERVAL) -> None:
+    """Run the capture/geocode/load stages until SIGTERM/SIGINT"""
+    if interval < MIN_SAMPLE_INTERVAL:
+        raise ValueError(f"Sample interval must be at least {MIN_SAMPLE_INTERVAL} second(s)")
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    logging.info(f"Start ISS tracker pipeline; sample interval {interval} seconds")
+    load_queue = asyncio.Queue(QUEUE_SIZE)
+    geocode_queue = asyncio.Queue(QUEUE_SIZE)
+    dedup = asyncio.Event()
+    await set_dedup(dedup)
+    loader = ISSDataLoader(flush_rows=flush_rows, flush_interval=flush_interval)
+    load_task = asyncio.create_task(load_worker(load_queue, loader, dedup))
+    geocode_tasks = [asyncio.create_task(geocode_worker(geocode_queue, load_queue))
+                     for _ in range(GEOCODE_CONCURRENCY)]
+    try:
+        await capture_positions(interval, load_queue, geocode_queue, dedup, stop)
+    finally:
+        logging.info("Shutting down; draining queued rows")
+        for _ in geocode_tasks:
+            await geocode_queue.put(None)
+        await asyncio.gather(*geocode_tasks, return_exceptions=True)
+        await load_queue.put(None)
+        await load_task
+        close_sessions()
+    logging.info("ISS tracker pipeline stopped")
+
+
+def run_async_daemon(interval: float = SAMPLE_INTERVAL, flush_rows: int = FLUSH_ROWS,
+                     flush_interval: float = FLUSH_INTERVAL) -> None:
+    """Sample the ISS every `interval` seconds with the asyncio pipeline"""
+    asyncio.run(run_pipeline(interval, flush_rows, flush_interval))
+# ```
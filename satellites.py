@@ -0,0 +1,217 @@
+#### *ISS Tracker - Multi-Satellite Tracking*
+
+
+###### Overview
+# - Tracks several satellites, by NORAD id, and backfills gaps in what is stored.
+#   Rows are stored and deduplicated under the satellite's `name` symbol (from the
+#   API, or `SATELLITE_NAMES`), so lookups by id go through `satellite_name`.
+# - Positions come from the bulk endpoint
+#       /v1/satellites/<id>/positions?timestamps=t1,t2,...
+#   which returns up to `POSITIONS_BATCH` positions per request instead of one.
+# - Satellites are fetched concurrently in a thread pool, but every request goes
+#   through one shared `RateLimiter`, so the combined rate stays within the API limit.
+# - `SatelliteTracker` plugs into the daemon in place of `extract_transform_load`:
+#   each tick is queued and fetched once `batch` ticks are pending. `batch=1` is one
+#   request per satellite per sample; `batch=10` makes a tenth of the requests at the
+#   cost of up to 10 intervals of lag.
+# - `fill_gaps` finds the grid timestamps with no stored row nearby for each
+#   satellite and fetches only those, in full batches. Backfilled rows take their
+#   address from the offline index/cache only, so a large backfill does not turn into
+#   thousands of Geoapify calls.
+
+
+###### Dependencies
+# ```Python
+import logging
+import math
+import numpy as np
+import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from analytics import load_questdb
+from iss_tracker import (SATELLITE_NAMES, ISSDataLoader, get_data_from_api, get_geocode_cache,
+                         load_iss_data, transform_iss_data, unixtime_to_date)
+from utils import config
+# ```
+
+
+###### Configurations
+# ```Python
+ISS = 25544                 # NORAD id
+POSITIONS_BATCH = 10        # timestamps per positions request (API maximum)
+RATE_LIMIT = 1.0            # requests per second, shared by all satellites
+RATE_BURST = 2              # requests allowed back-to-back after an idle spell
+MAX_WORKERS = 8             # satellites fetched at once
+GAP_STEP = 60.0             # seconds; sample spacing expected when looking for gaps
+FILL_FLUSH_ROWS = 1_000     # loader flush size for backfills
+# ```
+
+
+###### Rate Limiter
+# ```Python
+class RateLimiter:
+    """Token bucket shared by all request threads"""
+
+    def __init__(self, rate: float = RATE_LIMIT, burst: int = RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent"""
+        with metrics.timer('rate_limit'):
+            while True:
+                with self.lock:
+                    now = time.monotonic()
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                time.sleep(wait)
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the shared wheretheiss.at rate limiter"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
+# ```
+
+
+###### Extract
+# ```Python
+def satellite_url(satellite_id: int) -> str:
+    """Return the wheretheiss.at URL of a satellite, next to the configured ISS URL"""
+    return f"{config['Where-is-ISS']['url'].rsplit('/', 1)[0]}/{int(satellite_id)}"
+
+
+def satellite_name(satellite_id: int, limiter: RateLimiter = None) -> str:
+    """Return the `name` a satellite's rows are stored under, asking the API if it is not known"""
+    satellite_id = int(satellite_id)
+    if satellite_id not in SATELLITE_NAMES:
+        (limiter or get_rate_limiter()).acquire()
+        data = get_data_from_api(satellite_url(satellite_id))
+        if not isinstance(data, dict) or 'name' not in data:
+            raise ValueError(f"Unknown satellite {satellite_id}")
+        SATELLITE_NAMES[satellite_id] = str(data['name'])
+    return SATELLITE_NAMES[satellite_id]
+
+
+def fetch_positions(satellite_id: int, timestamps, limiter: RateLimiter = None) -> list:
+    """Return one satellite's positions at Unix timestamps, `POSITIONS_BATCH` per request"""
+    limiter = limiter or get_rate_limiter()
+    timestamps = [int(t) for t in timestamps]
+    positions = []
+    for i in range(0, len(timestamps), POSITIONS_BATCH):
+        batch = timestamps[i:i + POSITIONS_BATCH]
+        limiter.acquire()
+        data = get_data_from_api(f"{satellite_url(satellite_id)}/positions?timestamps={','.join(map(str, batch))}")
+        if not isinstance(data, list):
+            logging.error(f"No positions received for satellite {satellite_id} ({len(batch)} timestamp(s))")
+            continue
+        metrics.counter('positions_fetched_total').inc(len(data))
+        positions.extend(data)
+    return positions
+# ```
+
+
+###### Transform and Load
+# ```Python
+def track(satellite_id: int, timestamps, loader: ISSDataLoader = None, limiter: RateLimiter = None,
+          geocode: bool = True) -> int:
+    """Fetch, transform and load one satellite's positions; returns the rows loaded"""
+    positions = fetch_positions(satellite_id, timestamps, limiter)
+    for data in positions:
+        data['source'] = 'api'
+        if geocode:
+            data = transform_iss_data(data)
+        else:
+            with metrics.timer('transform'):
+                data['timestamp'] = unixtime_to_date(data['timestamp'])
+            data['geolocated_address'] = get_geocode_cache().lookup(data['latitude'], data['longitude'])
+        load_iss_data(data, loader)
+    return len(positions)
+
+
+def track_all(satellite_timestamps: dict, loader: ISSDataLoader = None, limiter: RateLimiter = None,
+              geocode: bool = True) -> dict:
+    """Run `track` for {satellite_id: timestamps} concurrently; returns rows loaded per satellite"""
+    limiter = limiter or get_rate_limiter()
+    jobs = {satellite_id: timestamps for satellite_id, timestamps in satellite_timestamps.items()
+            if len(timestamps)}
+    if not jobs:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(jobs)), thread_name_prefix='satellite') as pool:
+        futures = {satellite_id: pool.submit(track, satellite_id, timestamps, loader, limiter, geocode)
+                   for satellite_id, timestamps in jobs.items()}
+        return {satellite_id: future.result() for satellite_id, future in futures.items()}
+# ```
+
+
+###### Satellite Tracker (daemon source)
+# ```Python
+class SatelliteTracker:
+    """Samples several satellites per tick, fetching `batch` ticks per positions request"""
+
+    def __init__(self, satellite_ids=(ISS,), batch: int = 1, limiter: RateLimiter = None):
+        self.satellite_ids = list(dict.fromkeys(int(satellite_id) for satellite_id in satellite_ids))
+        self.batch = max(1, min(batch, POSITIONS_BATCH))
+        self.limiter = limiter or get_rate_limiter()
+        self.pending = []
+
+    def extract_transform_load(self, loader: ISSDataLoader = None) -> None:
+        """Drop-in replacement for `iss_tracker.extract_transform_load`"""
+        self.pending.append(int(time.time()))
+        if len(self.pending) >= self.batch:
+            self.flush(loader)
+
+    def flush(self, loader: ISSDataLoader = None) -> None:
+        """Fetch and load the pending ticks for every satellite"""
+        if not self.pending:
+            return
+        timestamps, self.pending = self.pending, []
+        logging.info(f"Fetch {len(timestamps)} position(s) for {len(self.satellite_ids)} satellite(s)")
+        track_all({satellite_id: timestamps for satellite_id in self.satellite_ids}, loader, self.limiter)
+# ```
+
+
+###### Gap Filling (main-entry-point)
+# ```Python
+def missing_timestamps(satellite_id: int, start: float, end: float, step: float = GAP_STEP) -> np.ndarray:
+    """Return `step`-spaced timestamps in [start, end) with no stored row within step/2"""
+    grid = np.arange(math.ceil(start / step) * step, end, step)
+    stored = load_questdb(start - step, end + step, satellite=satellite_name(satellite_id))['timestamp']
+    padded = np.concatenate(([-np.inf], stored, [np.inf]))
+    i = np.searchsorted(padded, grid)
+    nearest = np.minimum(grid - padded[i - 1], padded[i] - grid)
+    return grid[nearest > step / 2]
+
+
+def fill_gaps(satellite_ids, start: float, end: float, step: float = GAP_STEP,
+              limiter: RateLimiter = None) -> dict:
+    """Fetch and load the positions missing from QuestDB; returns rows loaded per satellite"""
+    try:
+        missing = {int(satellite_id): missing_timestamps(satellite_id, start, end, step)
+                   for satellite_id in dict.fromkeys(satellite_ids)}
+    except (requests.exceptions.RequestException, ValueError) as err:
+        logging.error(f"Could not read stored positions from QuestDB: {err}")
+        return {}
+    for satellite_id, timestamps in missing.items():
+        logging.info(f"Satellite {satellite_id}: {len(timestamps)} missing sample(s) "
+                     f"({math.ceil(len(timestamps) / POSITIONS_BATCH)} request(s))")
+    start_time = time.perf_counter()
+    with ISSDataLoader(flush_rows=FILL_FLUSH_ROWS) as loader:
+        loaded = track_all(missing, loader, limiter, geocode=False)
+    logging.info(f"Filled {sum(loaded.values())} position(s) in {time.perf_counter() - start_time:.1f} seconds")
+    return loaded
+# ```
@@ -0,0 +1,208 @@
+#### *ISS Tracker - Write Spool*
+
+
+###### Overview
+# - Keeps ILP rows that could not be sent to QuestDB instead of dropping them.
+# - Rows are appended to numbered segment files (`spool/000000000001.ilp`, ...);
+#   a segment is sealed once it reaches `segment_bytes`, and the oldest segments are
+#   deleted if the spool grows past `max_bytes`.
+# - `append()` only hands the rows to a writer thread, so the hot path never waits
+#   on disk I/O; if the writer falls behind, rows are dropped with an error.
+# - The replayer seals the active segment and streams segments, oldest first, over a
+#   plain ILP/TCP connection. ILP lines carry their own timestamps, so replayed rows
+#   land at their original time. A segment is deleted only after it is fully sent.
+
+
+###### Dependencies
+# ```Python
+import logging
+import metrics
+import os
+import queue
+import socket
+import threading
+from pathlib import Path
+# ```
+
+
+###### Configurations
+# ```Python
+SPOOL_DIR = Path(__file__).with_name('spool')
+SEGMENT_BYTES = 8 * 1024 * 1024         # seal a segment at this size
+MAX_SPOOL_BYTES = 512 * 1024 * 1024     # drop the oldest segments beyond this
+QUEUE_SIZE = 10_000                     # pending appends before rows are dropped
+REPLAY_INTERVAL = 30.0                  # seconds between replay attempts
+CONNECT_TIMEOUT = 5.0                   # seconds
+CLOSE_TIMEOUT = 10.0                    # seconds close() waits on the writer
+# ```
+
+
+###### Spool
+# ```Python
+class Spool:
+    """Append-only, segmented on-disk spool of ILP rows"""
+
+    def __init__(self, directory: Path = SPOOL_DIR, segment_bytes: int = SEGMENT_BYTES,
+                 max_bytes: int = MAX_SPOOL_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.replay_lock = threading.Lock()
+        self.queue = queue.Queue(QUEUE_SIZE)
+        segments = self.segments()
+        self.next_segment = int(segments[-1].stem) + 1 if segments else 1
+        self.active = None
+        self.stop = threading.Event()
+        self.replayer = None
+        self.writer = threading.Thread(target=self._write_loop, name='spool-writer', daemon=True)
+        self.writer.start()
+
+    def segments(self) -> list:
+        """Return segment paths, oldest first"""
+        return sorted(self.directory.glob('*.ilp'))
+
+    def size(self) -> int:
+        """Return the bytes currently spooled on disk"""
+        return sum(path.stat().st_size for path in self.segments() if path.exists())
+
+    def append(self, ilp: str) -> None:
+        """Queue ILP rows for spooling without blocking"""
+        try:
+            self.queue.put_nowait(ilp.encode())
+        except queue.Full:
+            metrics.error('spool_full')
+            logging.error(f"Spool writer is behind; dropping {ilp.count(chr(10))} row(s)")
+
+    def _write_loop(self) -> None:
+        while True:
+            chunks = [self.queue.get()]
+            while not self.queue.empty():
+                chunks.append(self.queue.get_nowait())
+            closing = None in chunks
+            with self.lock:
+                for chunk in chunks:
+                    if chunk is not None:
+                        self._guarded(self._write, chunk, rows=chunk.count(b'\n'))
+                self._guarded(self._sync_active, closing,
+                              rows=sum(chunk.count(b'\n') for chunk in chunks if chunk is not None))
+            if closing:
+                return
+
+    def _guarded(self, write, *args, rows: int = 0) -> None:
+        """Run a disk write, logging an OSError and reopening a fresh segment on the next row"""
+        try:
+            write(*args)
+        except OSError as err:
+            metrics.error('spool_write')
+            logging.error(f"Spool write failed; {rows} row(s) may be lost: {err}")
+            if self.active is not None:
+                try:
+                    self.active.close()
+                except OSError:
+                    pass
+                self.active = None
+
+    def _sync_active(self, seal: bool) -> None:
+        if self.active is not None:
+            self.active.flush()
+            os.fsync(self.active.fileno())
+            if seal:
+                self._seal()
+
+    def _write(self, chunk: bytes) -> None:
+        if self.active is None:
+            self.active = open(self.directory / f"{self.next_segment:012d}.ilp", 'ab')
+            self.next_segment += 1
+        self.active.write(chunk)
+        if self.active.tell() >= self.segment_bytes:
+            self._seal()
+            self._enforce_cap()
+
+    def _seal(self) -> None:
+        if self.active is not None:
+            self.active.flush()
+            os.fsync(self.active.fileno())
+            self.active.close()
+            self.active = None
+
+    def _enforce_cap(self) -> None:
+        segments = self.segments()
+        total = sum(path.stat().st_size for path in segments)
+        while total > self.max_bytes and segments:
+            oldest = segments.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink()
+            metrics.error('spool_overflow')
+            logging.error(f"Spool is over {self.max_bytes} bytes; dropped {oldest.name}")
+
+    def replay(self, host: str, port: int) -> int:
+        """Send spooled rows to QuestDB, oldest first; returns the bytes sent"""
+        if not self.replay_lock.acquire(blocking=False):
+            return 0
+        try:
+            return self._replay(host, port)
+        finally:
+            self.replay_lock.release()
+
+    def _replay(self, host: str, port: int) -> int:
+        with self.lock:
+            self._seal()
+            segments = self.segments()
+        if not segments:
+            return 0
+        metrics.retry('spool_replay')
+        try:
+            sock = socket.create_connection((host, port), timeout=CONNECT_TIMEOUT)
+        except OSError as err:
+            logging.warning(f"Spool replay postponed; {len(segments)} segment(s) pending: {err}")
+            return 0
+        sent = 0
+        with sock:
+            for path in segments:
+                try:
+                    data = path.read_bytes()
+                except FileNotFoundError:
+                    continue
+                data = data[:data.rfind(b'\n') + 1]     # drop a torn final line
+                try:
+                    sock.sendall(data)
+                except OSError as err:
+                    metrics.error('spool_replay')
+                    logging.error(f"Spool replay interrupted at {path.name}: {err}")
+                    break
+                path.unlink(missing_ok=True)
+                sent += len(data)
+            try:
+                sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+        logging.info(f"Replayed {sent} spooled byte(s) to QuestDB")
+        return sent
+
+    def start_replayer(self, host: str, port: int, interval: float = REPLAY_INTERVAL) -> None:
+        """Replay the spool in a background thread every `interval` seconds"""
+        if self.replayer is not None:
+            return
+
+        def replay_loop():
+            while not self.stop.wait(interval):
+                if self.segments():
+                    self.replay(host, port)
+
+        self.replayer = threading.Thread(target=replay_loop, name='spool-replayer', daemon=True)
+        self.replayer.start()
+
+    def close(self) -> None:
+        """Write out queued rows and stop the background threads"""
+        self.stop.set()
+        try:
+            self.queue.put(None, timeout=CLOSE_TIMEOUT)
+        except queue.Full:
+            metrics.error('spool_write')
+            logging.error(f"Spool writer did not drain within {CLOSE_TIMEOUT} seconds; queued rows are lost")
+        self.writer.join(CLOSE_TIMEOUT)
+        if self.replayer is not None:
+            self.replayer.join()
+# ```
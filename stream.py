@@ -0,0 +1,321 @@
+#### *ISS Tracker - Live Position Stream*
+
+
+###### Overview
+# - Lightweight asyncio HTTP server for the Phase 2 web map. Positions are pushed to
+#   browsers as the ETL loads them, so viewers never query QuestDB or the upstream API:
+#       GET /positions/stream                       Server-Sent Events, one per new position
+#       GET /positions/latest                       last position (JSON)
+#       GET /positions/recent?seconds=600&id=25544  recent history (JSON, compact rows)
+# - Fan-out cost is constant per position: each event is encoded once and the same
+#   bytes are written to every viewer. Viewers wait on one shared future (keep-alive
+#   comments are broadcast the same way), so an idle viewer costs a socket and a
+#   suspended task, nothing more.
+# - Writes never wait on a viewer: a viewer that falls behind skips to the newest
+#   event, and one with more than `MAX_VIEWER_BUFFER` bytes unsent is disconnected.
+# - Recent history lives in `PositionRing`, a fixed-size NumPy array of
+#   `RING_FIELDS` (48 bytes a row) rather than a list of dicts. JSON responses are
+#   built in a worker thread, so a large window never stalls the stream, and the
+#   last `RECENT_CACHE_SIZE` of them are cached until the next position arrives.
+# - The server runs its own event loop in a background thread; `publish()` can be
+#   called from any thread (it is registered as an `iss_tracker` row listener).
+
+
+###### Dependencies
+# ```Python
+import asyncio
+import json
+import logging
+import math
+import numpy as np
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+import metrics
+# ```
+
+
+###### Configurations
+# ```Python
+RING_FIELDS = ('timestamp', 'id', 'latitude', 'longitude', 'altitude', 'velocity')
+RING_CAPACITY = 86_400      # rows of recent history (one day at 1 Hz, ~4 MB)
+RECENT_SECONDS = 3600.0     # default window of /positions/recent
+MAX_RECENT_SECONDS = 7 * 86_400.0   # largest window of /positions/recent
+RECENT_CACHE_SIZE = 8       # /positions/recent responses kept (up to ~4 MB each)
+ENCODE_CHUNK = 2048         # rows per json.dumps call; the GIL is held for a whole call
+HEARTBEAT = 15.0            # seconds between SSE keep-alive comments
+SEND_TIMEOUT = 10.0         # seconds to send a plain (non-stream) response
+MAX_VIEWER_BUFFER = 64 * 1024   # unsent bytes before a stream viewer is dropped
+HEADER_TIMEOUT = 5.0        # seconds to receive the request line and headers
+BACKLOG = 1024              # pending connections, for bursts of reconnecting viewers
+# ```
+
+
+###### Ring Buffer
+# ```Python
+class PositionRing:
+    """Fixed-size ring of recent positions stored in one float64 array"""
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.rows = np.full((capacity, len(RING_FIELDS)), np.nan)
+        self.capacity = capacity
+        self.next = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, values: tuple) -> None:
+        """Add one row; a row with the same timestamp and id as the last replaces it"""
+        with self.lock:
+            last = (self.next - 1) % self.capacity
+            if self.count and self.rows[last, 0] == values[0] and self.rows[last, 1] == values[1]:
+                self.rows[last] = values
+                return
+            self.rows[self.next] = values
+            self.next = (self.next + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def recent(self, since: float = None, satellite_id: int = None, limit: int = None) -> np.ndarray:
+        """Return rows (oldest first) at or after `since`, optionally for one satellite"""
+        with self.lock:
+            rows = self.rows[(self.next - self.count + np.arange(self.count)) % self.capacity]
+        if since is not None:
+            rows = rows[rows[:, 0] >= since]
+        if satellite_id is not None:
+            rows = rows[rows[:, 1] == satellite_id]
+        if limit is not None:
+            rows = rows[-limit:] if limit > 0 else rows[:0]
+        return rows
+
+    def latest_timestamp(self) -> float:
+        """Return the timestamp of the newest row, or None if empty"""
+        with self.lock:
+            return self.rows[(self.next - 1) % self.capacity, 0] if self.count else None
+# ```
+
+
+###### Stream Server
+# ```Python
+def _number(value) -> float:
+    return np.nan if value is None else float(value)
+
+
+def position_event(data: dict) -> dict:
+    """Return the JSON-ready event for an ETL row"""
+    timestamp = data['timestamp']
+    return {
+        'name': data.get('name'),
+        'id': data.get('id'),
+        'timestamp': timestamp.timestamp() if isinstance(timestamp, datetime) else float(timestamp),
+        'latitude': data.get('latitude'),
+        'longitude': data.get('longitude'),
+        'altitude': data.get('altitude'),
+        'velocity': data.get('velocity'),
+        'geolocated_address': data.get('geolocated_address', ''),
+    }
+
+
+def _response(status: str, content_type: str, body: bytes) -> bytes:
+    return (f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Access-Control-Allow-Origin: *\r\nCache-Control: no-cache\r\nConnection: close\r\n\r\n"
+            ).encode() + body
+
+
+_SSE_HEADERS = (b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                b"Access-Control-Allow-Origin: *\r\nConnection: keep-alive\r\n\r\nretry: 3000\n\n")
+
+
+class StreamServer:
+    """Pushes each published position to every connected viewer over Server-Sent Events"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8080, capacity: int = RING_CAPACITY):
+        self.host = host
+        self.port = port
+        self.ring = PositionRing(capacity)
+        self.loop = None
+        self.server = None
+        self.seq = 0
+        self.latest = None          # (seq, event dict, SSE frame)
+        self.last_broadcast = 0.0
+        self.waiter = None
+        self.viewers = 0
+        self.closing = False
+        self.heartbeat = None
+        self.recent_cache = OrderedDict()
+        self.ready = threading.Event()
+        self.error = None
+        self.thread = None
+
+    def start(self) -> 'StreamServer':
+        """Serve from a background thread; returns once the socket is listening"""
+        self.thread = threading.Thread(target=self._run, name='stream-server', daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        logging.info(f"Streaming positions on http://{self.host}:{self.port}/positions/stream")
+        return self
+
+    def _run(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.waiter = self.loop.create_future()
+        self.last_broadcast = self.loop.time()
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, backlog=BACKLOG))
+        except OSError as err:
+            self.error = err
+            self.loop.close()
+            self.ready.set()
+            return
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.heartbeat = self.loop.create_task(self._heartbeat())
+        self.ready.set()
+        self.loop.run_forever()
+
+    def stop(self) -> None:
+        """Disconnect all viewers and stop the event loop"""
+        if self.loop is not None and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+
+    async def _shutdown(self) -> None:
+        self.server.close()
+        self.closing = True
+        self._wake(b"")
+        self.heartbeat.cancel()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if tasks:
+            await asyncio.wait(tasks, timeout=HEADER_TIMEOUT)
+
+    def publish(self, data: dict) -> None:
+        """Record a position and push it to every viewer; safe to call from any thread"""
+        event = position_event(data)
+        self.ring.append((event['timestamp'], _number(event['id']), _number(event['latitude']),
+                          _number(event['longitude']), _number(event['altitude']),
+                          _number(event['velocity'])))
+        payload = json.dumps(event, separators=(',', ':'))
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._broadcast, event, payload)
+
+    def _broadcast(self, event: dict, payload: str) -> None:
+        self.seq += 1
+        frame = f"id: {self.seq}\nevent: position\ndata: {payload}\n\n".encode()
+        self.latest = (self.seq, event, frame)
+        self.recent_cache.clear()
+        self._wake(frame)
+        metrics.counter('stream_events_total').inc()
+
+    def _wake(self, frame: bytes) -> None:
+        self.last_broadcast = self.loop.time()
+        waiter, self.waiter = self.waiter, self.loop.create_future()
+        waiter.set_result((self.seq, frame))
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT - (self.loop.time() - self.last_broadcast))
+            if self.loop.time() - self.last_broadcast >= HEARTBEAT:
+                self._wake(b": ping\n\n")
+
+    async def _next(self, seq: int) -> tuple:
+        """Return the next frame; a viewer that fell behind gets the newest event"""
+        if self.latest is not None and self.latest[0] != seq:
+            return self.latest[0], self.latest[2]
+        return await self.waiter
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+            while await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT) not in (b'\r\n', b'\n', b''):
+                pass
+            method, target, _ = request.decode('latin-1').split(' ', 2)
+            url = urlsplit(target)
+            if method != 'GET':
+                writer.write(_response('405 Method Not Allowed', 'text/plain', b'GET only\n'))
+            elif url.path == '/positions/stream':
+                await self._stream(writer)
+            elif url.path == '/positions/latest':
+                body = json.dumps(self.latest[1] if self.latest else None).encode()
+                writer.write(_response('200 OK', 'application/json', body))
+            elif url.path == '/positions/recent':
+                try:
+                    key = self._recent_key(parse_qs(url.query))
+                except ValueError as err:
+                    writer.write(_response('400 Bad Request', 'text/plain', f"{err}\n".encode()))
+                else:
+                    body = await self._recent(key)
+                    writer.write(_response('200 OK', 'application/json', body))
+            else:
+                writer.write(_response('404 Not Found', 'text/plain', b'Not found\n'))
+            await asyncio.wait_for(writer.drain(), SEND_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream(self, writer: asyncio.StreamWriter) -> None:
+        self.viewers += 1
+        metrics.counter('stream_viewers_total').inc()
+        try:
+            writer.write(_SSE_HEADERS)
+            seq = None
+            if self.latest is not None:
+                seq, frame = self.latest[0], self.latest[2]
+                writer.write(frame)
+            while not (self.closing or writer.is_closing()):
+                if writer.transport.get_write_buffer_size() > MAX_VIEWER_BUFFER:
+                    metrics.error('stream_slow_viewer')
+                    return
+                seq, frame = await self._next(seq)
+                writer.write(frame)
+        finally:
+            self.viewers -= 1
+
+    def _recent_key(self, query: dict) -> tuple:
+        """Validate a /positions/recent query into (seconds, satellite id, limit); raises ValueError"""
+        try:
+            seconds = float(query.get('seconds', [RECENT_SECONDS])[0])
+        except ValueError:
+            seconds = math.nan
+        if not math.isfinite(seconds):
+            raise ValueError("seconds must be a finite number")
+        seconds = min(max(round(seconds), 0), MAX_RECENT_SECONDS)
+        try:
+            satellite_id = int(query['id'][0]) if 'id' in query else None
+        except ValueError:
+            raise ValueError("id must be an integer") from None
+        try:
+            limit = min(max(int(query['limit'][0]), 0), self.ring.capacity) if 'limit' in query else None
+        except ValueError:
+            raise ValueError("limit must be an integer") from None
+        return seconds, satellite_id, limit
+
+    async def _recent(self, key: tuple) -> bytes:
+        seconds, satellite_id, limit = key
+        body = self.recent_cache.get(key)
+        if body is None:
+            latest = self.ring.latest_timestamp()
+            since = None if latest is None else latest - seconds
+            body = self.loop.run_in_executor(None, self._recent_body, since, satellite_id, limit)
+            self.recent_cache[key] = body
+            if len(self.recent_cache) > RECENT_CACHE_SIZE:
+                self.recent_cache.popitem(last=False)
+        else:
+            self.recent_cache.move_to_end(key)
+        return await body
+
+    def _recent_body(self, since: float, satellite_id: int, limit: int) -> bytes:
+        """Encode recent rows as compact JSON; runs in a worker thread"""
+        rows = self.ring.recent(since, satellite_id, limit)
+        chunks = (json.dumps(np.where(np.isnan(chunk), None, chunk).tolist(), separators=(',', ':'))[1:-1]
+                  for chunk in np.array_split(rows, range(ENCODE_CHUNK, len(rows), ENCODE_CHUNK)))
+        fields = json.dumps(RING_FIELDS, separators=(',', ':'))
+        return f'{{"fields":{fields},"rows":[{",".join(chunk for chunk in chunks if chunk)}]}}'.encode()
+
+
+def start_stream_server(port: int, host: str = '127.0.0.1', capacity: int = RING_CAPACITY) -> StreamServer:
+    """Serve the live position stream from a background thread"""
+    return StreamServer(host, port, capacity).start()
+# ```